@@ -1,7 +1,9 @@
+import time
 import streamlit as st
+from config import JOB_POLL_INTERVAL
 from src.manager import PortfolioManager
-from src.web_search import web_search, generate_resume
-from src.retrieval import initialize_rag
+from src.rag_service import get_rag_service
+from src.jobs import get_job_queue, PRIORITY_HIGH, QUEUED, DONE, FINISHED
 
 # Configuration de la page
 st.set_page_config(
@@ -21,10 +23,12 @@ if "current_resume" not in st.session_state:
     st.session_state.current_resume = None
 if "portfolio" not in st.session_state:
     st.session_state.portfolio = PortfolioManager()
-if "rag" not in st.session_state:
-    st.session_state.rag = None
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "research_job" not in st.session_state:
+    st.session_state.research_job = None
+if "add_job" not in st.session_state:
+    st.session_state.add_job = None
 
 
 def reset_to_menu():
@@ -32,10 +36,20 @@ def reset_to_menu():
     st.session_state.step = "menu"
     st.session_state.current_company = None
     st.session_state.current_resume = None
+    st.session_state.research_job = None
+    st.session_state.add_job = None
+
+
+def poll():
+    """Relance le script après un court délai pour suivre une tâche de fond"""
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
 
 
 def main():
     st.title("Assistant Portfolio d'Entreprises")
+    # Démarre le chargement de l'index partagé (une seule fois par processus)
+    get_rag_service()
 
     # Écran de démarrage
     if not st.session_state.started:
@@ -67,10 +81,6 @@ def main():
         with col2:
             if st.button("Discuter avec le portfolio", use_container_width=True):
                 st.session_state.step = "chat"
-                # Initialiser le RAG si pas encore fait
-                if st.session_state.rag is None:
-                    with st.spinner("Initialisation du système RAG..."):
-                        st.session_state.rag = initialize_rag(rebuild=True)
                 st.rerun()
 
         with col3:
@@ -89,14 +99,12 @@ def main():
         with col1:
             if st.button("Rechercher", type="primary", use_container_width=True):
                 if company_name:
-                    with st.spinner(f"Recherche en cours pour '{company_name}'..."):
-                        search_results = web_search(company_name)
-                        resume = generate_resume(company_name, search_results)
-
-                        st.session_state.current_company = company_name
-                        st.session_state.current_resume = resume
-                        st.session_state.step = "show_resume"
-                        st.rerun()
+                    # Recherche en tâche de fond: une recherche identique déjà en cours est partagée
+                    st.session_state.research_job = get_job_queue().submit(
+                        "research", {"company_name": company_name}
+                    )
+                    st.session_state.step = "researching"
+                    st.rerun()
                 else:
                     st.warning("Veuillez entrer un nom d'entreprise.")
 
@@ -105,6 +113,40 @@ def main():
                 reset_to_menu()
                 st.rerun()
 
+    # Suivi de la recherche en cours
+    elif st.session_state.step == "researching":
+        st.markdown("---")
+        job = get_job_queue().get(st.session_state.research_job)
+        if job is None:
+            st.error("Recherche introuvable.")
+            if st.button("Retour au menu", use_container_width=True):
+                reset_to_menu()
+                st.rerun()
+            return
+
+        company_name = job["params"]["company_name"]
+        st.subheader(f"Recherche: {company_name}")
+        if job["status"] == DONE:
+            st.session_state.current_company = company_name
+            st.session_state.current_resume = job["result"]["resume"]
+            st.session_state.step = "show_resume"
+            st.rerun()
+        elif job["finished_at"]:
+            st.error(f"Erreur lors de la recherche: {job['error']}")
+        elif job["status"] == QUEUED:
+            st.info(f"En file d'attente ({job.get('position', 0)} recherche(s) avant la vôtre)...")
+        else:
+            st.info(f"{job['progress'] or 'Recherche en cours'}...")
+            # Le résumé s'affiche au fil de la génération
+            if job["partial"]:
+                st.markdown(job["partial"])
+
+        if st.button("Retour", use_container_width=True):
+            reset_to_menu()
+            st.rerun()
+        if not job["finished_at"]:
+            poll()
+
     # Affichage du résumé
     elif st.session_state.step == "show_resume":
         st.markdown("---")
@@ -137,20 +179,14 @@ def main():
         col1, col2 = st.columns([1, 1])
         with col1:
             if st.button("Sauvegarder", type="primary", use_container_width=True):
-                success = st.session_state.portfolio.add_company(
-                    st.session_state.current_company,
-                    st.session_state.current_resume,
-                    comment
-                )
-                if success:
-                    st.success(f"{st.session_state.current_company} ajouté au portfolio!")
-                    # Reconstruire l'index RAG
-                    if st.session_state.rag:
-                        st.session_state.rag.rebuild_index()
-                    st.session_state.step = "saved"
-                    st.rerun()
-                else:
-                    st.error("Erreur lors de l'ajout.")
+                # L'ajout passe devant les recherches; la réindexation suit en tâche séparée
+                st.session_state.add_job = get_job_queue().submit("add_company", {
+                    "company_name": st.session_state.current_company,
+                    "resume": st.session_state.current_resume,
+                    "comment": comment,
+                }, PRIORITY_HIGH)
+                st.session_state.step = "saved"
+                st.rerun()
 
         with col2:
             if st.button("Retour", use_container_width=True):
@@ -160,11 +196,26 @@ def main():
     # Confirmation de sauvegarde
     elif st.session_state.step == "saved":
         st.markdown("---")
-        st.success(f"L'entreprise **{st.session_state.current_company}** a été ajoutée avec succès!")
+        queue = get_job_queue()
+        job = queue.get(st.session_state.add_job)
+        pending = False
+        if job is not None and job["status"] not in FINISHED:
+            st.info(f"Ajout de **{st.session_state.current_company}** en cours...")
+            pending = True
+        elif job is not None and job["status"] == DONE and job["result"]["added"]:
+            st.success(f"L'entreprise **{st.session_state.current_company}** a été ajoutée avec succès!")
+            reindex = queue.get(job["result"]["reindex_job"]) if job["result"]["reindex_job"] else None
+            if reindex and not reindex["finished_at"]:
+                st.caption("Mise à jour de l'index du portfolio en arrière-plan...")
+                pending = True
+        else:
+            st.error("Erreur lors de l'ajout.")
 
         if st.button("Retour au menu", type="primary", use_container_width=True):
             reset_to_menu()
             st.rerun()
+        if pending:
+            poll()
 
     # Vue du portfolio
     elif st.session_state.step == "view_portfolio":
@@ -216,15 +267,20 @@ def main():
 
             # Générer la réponse
             with st.chat_message("assistant"):
-                with st.spinner("Réflexion..."):
-                    if st.session_state.rag:
-                        response = st.session_state.rag.ask(prompt)
-                        answer = response["answer"]
-                    else:
-                        answer = "Le système RAG n'est pas initialisé."
-
+                # Index partagé par toutes les sessions; seul le tout premier chargement est attendu
+                service = get_rag_service()
+                rag = service.get(timeout=0)
+                if rag is None:
+                    with st.spinner("Chargement de l'index du portfolio..."):
+                        rag = service.get()
+                if rag:
+                    events = rag.ask_stream(prompt)
+                    answer = st.write_stream(event["token"] for event in events if "token" in event)
+                else:
+                    answer = "Le système RAG n'est pas initialisé."
                     st.markdown(answer)
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
+
+                st.session_state.messages.append({"role": "assistant", "content": answer})
 
         st.markdown("---")
         col1, col2 = st.columns([1, 1])
@@ -0,0 +1,87 @@
+"""Benchmark du pipeline d'embeddings contre un faux serveur Ollama local.
+
+Le faux serveur simule /api/embed: une latence fixe par requête (aller-retour
+HTTP, chargement) plus un coût par texte, avec un nombre limité de requêtes
+traitées en parallèle (équivalent de OLLAMA_NUM_PARALLEL).
+
+Usage: python -m benchmarks.bench_embeddings [--docs 200] [--parallel 4]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.embeddings import BatchedOllamaEmbeddings
+
+
+def make_handler(request_latency: float, per_text_latency: float, slots: threading.Semaphore, dim: int):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+            time.sleep(request_latency)
+            with slots:
+                time.sleep(per_text_latency * len(texts))
+            body = json.dumps({
+                "model": payload["model"],
+                "embeddings": [[random.random() for _ in range(dim)] for _ in texts]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeOllamaHandler
+
+
+def run(embeddings: BatchedOllamaEmbeddings, texts) -> float:
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(texts)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--parallel", type=int, default=4, help="requêtes traitées en parallèle par le serveur")
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    parser.add_argument("--per-text-latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    handler = make_handler(args.request_latency, args.per_text_latency, threading.Semaphore(args.parallel), args.dim)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    texts = [f"Entreprise {i}: résumé de test" for i in range(args.docs)]
+    silent = lambda done, total: None
+
+    configurations = [
+        ("un texte par requête, séquentiel", 1, 1),
+        ("un seul lot (comportement OllamaEmbeddings)", args.docs, 1),
+        ("lots de 16, séquentiel", 16, 1),
+        ("lots de 16, 4 requêtes parallèles", 16, 4),
+        ("lots de 8, 8 requêtes parallèles", 8, 8),
+    ]
+    print(f"{args.docs} documents, serveur: {args.parallel} slot(s), "
+          f"{args.request_latency * 1000:.0f} ms/requête + {args.per_text_latency * 1000:.0f} ms/texte")
+    for label, batch_size, concurrency in configurations:
+        embeddings = BatchedOllamaEmbeddings(
+            model="fake", base_url=base_url, batch_size=batch_size,
+            concurrency=concurrency, progress=silent
+        )
+        elapsed = run(embeddings, texts)
+        print(f"{label:<45} {elapsed:7.2f} s  ({args.docs / elapsed:7.1f} docs/s)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
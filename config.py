@@ -16,12 +16,50 @@ GOOGLE_API_URL = os.getenv("GOOGLE_API_URL")
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api/chat")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
 OLLAMA_API = os.getenv("OLLAMA_API", "http://localhost:11434")
+# Timeout (s) for chat generation requests (read timeout between streamed chunks)
+OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", 60))
 
 # Data Paths
 DATA_DIR = BASE_DIR / os.getenv("DATA_DIR", "data")
 PORTFOLIO_FILE = DATA_DIR / os.getenv("PORTFOLIO_FILE", "portfolio_entreprises.csv")
 VECTORSTORE_DIR = DATA_DIR / os.getenv("VECTORSTORE_DIR", "vectorstore")
 VECTOR_STORE_PATH = BASE_DIR / os.getenv("VECTOR_STORE_PATH", "portfolio_vectorstore")
+EMBEDDING_CACHE_DIR = DATA_DIR / os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", 256))
+# Embedding requests to Ollama: texts per request, parallel requests, retries, timeout (s)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 16))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 3))
+EMBED_TIMEOUT = int(os.getenv("EMBED_TIMEOUT", 120))
+
+# RAG retrieval: documents returned, MMR candidates, min relevance score (0 = off), prompt context budget
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", 4))
+RAG_FETCH_K = int(os.getenv("RAG_FETCH_K", 20))
+RAG_SCORE_THRESHOLD = float(os.getenv("RAG_SCORE_THRESHOLD", 0))
+RAG_USE_MMR = os.getenv("RAG_USE_MMR", "false").lower() == "true"
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", 0.5))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 2048))
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+# Resume generation: token budget for search snippets + page content, max share taken by snippets
+RESUME_CONTEXT_TOKENS = int(os.getenv("RESUME_CONTEXT_TOKENS", 1024))
+RESUME_SNIPPET_SHARE = float(os.getenv("RESUME_SNIPPET_SHARE", 0.35))
+# Optional JSON {"Company name": ["alias", ...]} used to route questions naming a company
+COMPANY_ALIASES_FILE = DATA_DIR / os.getenv("COMPANY_ALIASES_FILE", "company_aliases.json")
+# Hybrid search: RRF constant; queries up to this many terms are answered by BM25 alone
+# when every term appears in at most SEARCH_KEYWORD_MAX_DF of the documents
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", 60))
+SEARCH_KEYWORD_MAX_TERMS = int(os.getenv("SEARCH_KEYWORD_MAX_TERMS", 3))
+SEARCH_KEYWORD_MAX_DF = float(os.getenv("SEARCH_KEYWORD_MAX_DF", 0.2))
+# RAG answer cache: max entries, TTL (s), cosine similarity for near-identical questions
+# (0 = exact only, the default: calibrate on the embedding model before enabling)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 256))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0))
+
+# Portfolio storage backend: "csv" (default) or "sqlite" (stored next to PORTFOLIO_FILE as .db)
+PORTFOLIO_BACKEND = os.getenv("PORTFOLIO_BACKEND", "csv")
+# CSV backend: comment log size (bytes) that triggers a background compaction into the CSV
+COMMENT_LOG_COMPACT_BYTES = int(os.getenv("COMMENT_LOG_COMPACT_BYTES", 256 * 1024))
 
 # Ensure directories exist
 DATA_DIR.mkdir(exist_ok=True)
@@ -30,4 +68,88 @@ VECTORSTORE_DIR.mkdir(exist_ok=True)
 # Scraping & Request Settings
 SCRAPE_MAX_CHARS = int(os.getenv("SCRAPE_MAX_CHARS", 5000))
 SCRAPE_TIMEOUT = int(os.getenv("SCRAPE_TIMEOUT", 15000))
-REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 10))
\ No newline at end of file
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 10))
+# Playwright pool: browsers kept alive, pages served before a browser is relaunched
+SCRAPE_POOL_SIZE = int(os.getenv("SCRAPE_POOL_SIZE", 2))
+SCRAPE_RECYCLE_PAGES = int(os.getenv("SCRAPE_RECYCLE_PAGES", 50))
+# Page readiness: resource types aborted, max wait after DOMContentLoaded, network quiet time, poll interval (ms)
+SCRAPE_BLOCKED_RESOURCES = [r.strip() for r in os.getenv("SCRAPE_BLOCKED_RESOURCES", "image,media,font").split(",") if r.strip()]
+SCRAPE_READY_MAX_MS = int(os.getenv("SCRAPE_READY_MAX_MS", 3000))
+SCRAPE_IDLE_MS = int(os.getenv("SCRAPE_IDLE_MS", 500))
+SCRAPE_READY_POLL_MS = int(os.getenv("SCRAPE_READY_POLL_MS", 250))
+# Optional JSON {"domain": {"fixed_wait_ms": 2000, "blocked_resources": [...], "max_wait_ms": ...}}
+SCRAPE_DOMAIN_OVERRIDES_FILE = DATA_DIR / os.getenv("SCRAPE_DOMAIN_OVERRIDES_FILE", "scrape_overrides.json")
+# HTTP fast path: per-domain memory of the scraping tier that worked ("http" or "browser"), re-probed after TTL
+SCRAPE_TIERS_FILE = DATA_DIR / os.getenv("SCRAPE_TIERS_FILE", "scrape_tiers.json")
+SCRAPE_TIER_TTL_DAYS = float(os.getenv("SCRAPE_TIER_TTL_DAYS", 7))
+# research_company: URLs scraped concurrently, per-host and global limits, overall deadline (s)
+SCRAPE_NUM_URLS = int(os.getenv("SCRAPE_NUM_URLS", 3))
+SCRAPE_PER_HOST = int(os.getenv("SCRAPE_PER_HOST", 2))
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", 6))
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", 20))
+# Pages whose word shingles overlap above this Jaccard ratio are treated as duplicates; merged context size
+SCRAPE_DEDUP_THRESHOLD = float(os.getenv("SCRAPE_DEDUP_THRESHOLD", 0.8))
+SCRAPE_CONTEXT_MAX_CHARS = int(os.getenv("SCRAPE_CONTEXT_MAX_CHARS", 8000))
+
+# Batch ingestion (python -m src.batch): workers per stage, queue size between stages, rows per bulk commit
+BATCH_SEARCH_WORKERS = int(os.getenv("BATCH_SEARCH_WORKERS", 4))
+BATCH_SCRAPE_WORKERS = int(os.getenv("BATCH_SCRAPE_WORKERS", 4))
+BATCH_SUMMARY_WORKERS = int(os.getenv("BATCH_SUMMARY_WORKERS", 1))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", 8))
+BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", 20))
+
+# Shared HTTP clients (Google, Ollama): connection pool size, retries with jittered exponential backoff (s)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 30))
+# Longer Retry-After values (e.g. exhausted daily quota) are not waited for
+HTTP_RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", 60))
+# Circuit breaker: consecutive failures before opening, seconds before a trial request
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", 5))
+HTTP_BREAKER_RESET = float(os.getenv("HTTP_BREAKER_RESET", 30))
+
+# Persistent cache for web searches and scraped pages (zlib-compressed SQLite, LRU beyond the size cap)
+CACHE_FILE = DATA_DIR / os.getenv("CACHE_FILE", "cache.db")
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 100))
+# TTLs (s); 0 disables caching. Expired pages are revalidated with ETag/Last-Modified when available
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 86400))
+SCRAPE_CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", 3 * 86400))
+
+# Refresh worker (python -m src.refresh): companies older than REFRESH_MAX_AGE_DAYS are re-researched,
+# REFRESH_BATCH_SIZE per cycle every REFRESH_INTERVAL seconds
+REFRESH_MAX_AGE_DAYS = float(os.getenv("REFRESH_MAX_AGE_DAYS", 30))
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", 10))
+REFRESH_INTERVAL = int(os.getenv("REFRESH_INTERVAL", 3600))
+# Token buckets per upstream: Google Custom Search free tier is 100 queries/day
+REFRESH_GOOGLE_PER_DAY = float(os.getenv("REFRESH_GOOGLE_PER_DAY", 50))
+REFRESH_OLLAMA_PER_HOUR = float(os.getenv("REFRESH_OLLAMA_PER_HOUR", 60))
+# New resume is written back only when its word-level similarity to the old one is below this ratio
+REFRESH_SIMILARITY = float(os.getenv("REFRESH_SIMILARITY", 0.8))
+# Seconds before a company whose refresh failed is retried
+REFRESH_FAILURE_BACKOFF = int(os.getenv("REFRESH_FAILURE_BACKOFF", 6 * 3600))
+
+# Shared RAG service: seconds between checks for portfolio changes (index hot-swapped in the background)
+RAG_REFRESH_INTERVAL = float(os.getenv("RAG_REFRESH_INTERVAL", 10))
+
+# Background jobs (research, additions, reindexing): worker threads and persisted state (one JSON file per job)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOBS_DIR = DATA_DIR / os.getenv("JOBS_DIR", "jobs")
+# Seconds finished jobs are kept on disk; seconds between UI status polls
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", 86400))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+
+# HTTP API (python -m src.api): bind address
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", 8000))
+
+# Ollama request scheduler: max concurrent requests per process (match the server's OLLAMA_NUM_PARALLEL)
+# and per priority class (interactive chat > single research > batch/indexing)
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("OLLAMA_MAX_IN_FLIGHT", 4))
+OLLAMA_MAX_INTERACTIVE = int(os.getenv("OLLAMA_MAX_INTERACTIVE", 4))
+OLLAMA_MAX_RESEARCH = int(os.getenv("OLLAMA_MAX_RESEARCH", 3))
+OLLAMA_MAX_BATCH = int(os.getenv("OLLAMA_MAX_BATCH", 2))
+
+# Per-stage latency metrics (Prometheus text on the API's /metrics) and one JSON log line per measured stage
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_LOG_JSON = os.getenv("METRICS_LOG_JSON", "false").lower() == "true"
\ No newline at end of file
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional
+import numpy as np
+from config import ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY
+from src.entities import normalize
+
+
+class _Entry:
+    def __init__(self, result: Dict, embedding: Optional[np.ndarray], companies: FrozenSet[str]):
+        self.result = result
+        self.embedding = embedding
+        self.companies = companies
+        self.created_at = time.monotonic()
+
+
+class AnswerCache:
+    """Cache des réponses du RAG: clé = question normalisée, recherche sémantique optionnelle
+
+    Toutes les entrées sont liées à une version de l'index: dès que la version
+    change (vector store modifié), le cache est vidé. Éviction LRU bornée par
+    max_entries et expiration après ttl secondes.
+
+    La recherche sémantique ne compare que des questions qui citent les mêmes
+    entreprises (« Que fait Airbus ? » ne répond pas à « Que fait Orange ? »)
+    et n'est tentée que pour les questions sans entreprise citée: celles-ci
+    passent par le chemin rapide, sans embedding. Désactivée par défaut
+    (similarity_threshold = 0) tant que le seuil n'est pas calibré pour le modèle.
+    """
+
+    def __init__(self, embed: Optional[Callable[[str], List[float]]] = None,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl: float = ANSWER_CACHE_TTL,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY):
+        self.embed = embed
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.version: Optional[str] = None
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def semantic(self) -> bool:
+        return self.embed is not None and self.similarity_threshold > 0
+
+    def _embedding(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embed(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _check_version(self, version: str):
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    def _expired(self, entry: _Entry) -> bool:
+        return self.ttl > 0 and time.monotonic() - entry.created_at > self.ttl
+
+    def get(self, question: str, version: str, companies: Iterable[str] = ()) -> Optional[Dict]:
+        """Réponse en cache; companies: entreprises citées dans la question (name_index.match)"""
+        key = normalize(question)
+        companies = frozenset(companies)
+        with self._lock:
+            self._check_version(version)
+            entry = self.entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry.result
+            candidates = [
+                (k, e) for k, e in self.entries.items()
+                if e.embedding is not None and e.companies == companies and not self._expired(e)
+            ]
+
+        if self.semantic and not companies and candidates:
+            query = self._embedding(question)
+            similarities = np.stack([e.embedding for _, e in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                with self._lock:
+                    best_key, best_entry = candidates[best]
+                    if best_key in self.entries:
+                        self.entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return best_entry.result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question: str, version: str, result: Dict, companies: Iterable[str] = ()):
+        companies = frozenset(companies)
+        # Questions routées (entreprise citée): jamais comparées sémantiquement, pas d'embedding
+        embedding = self._embedding(question) if self.semantic and not companies else None
+        with self._lock:
+            self._check_version(version)
+            key = normalize(question)
+            self.entries.pop(key, None)
+            self.entries[key] = _Entry(result, embedding, companies)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
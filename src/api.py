@@ -0,0 +1,260 @@
+"""API HTTP asynchrone: recherche d'entreprise, portefeuille et questions RAG.
+
+Les appels distants (Google, Ollama) passent par des clients httpx async et le
+scraping par le pipeline asyncio, dans la boucle du serveur; les appels
+Ollama passent par l'ordonnanceur partagé du processus (src/ollama_scheduler.py),
+les questions devant les recherches. Le stockage et la chaîne RAG,
+synchrones, s'exécutent dans le pool de threads. L'index est le service RAG
+partagé du processus (src/rag_service.py).
+
+Usage: python -m src.api [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool
+from config import (
+    GOOGLE_API_URL, OLLAMA_API_URL, OLLAMA_TIMEOUT, SCRAPE_NUM_URLS, REQUEST_TIMEOUT,
+    API_HOST, API_PORT
+)
+from src import metrics
+from src.async_http import create_clients
+from src.async_scrape import scrape_urls_async
+from src.browser import get_browser_pool
+from src.http_client import CircuitOpenError
+from src.manager import PortfolioManager
+from src.ollama_scheduler import get_scheduler
+from src.rag_service import get_rag_service
+from src.scrape_policy import scrape_metrics
+from src.web_search import (
+    cached_search, search_params, parse_search_response, resume_payload, parse_resume_response,
+    SEARCH_ERROR_PREFIX, RESUME_ERROR_PREFIXES
+)
+
+
+class ResearchRequest(BaseModel):
+    company_name: str
+    scrape: bool = True
+    refresh: bool = False
+
+
+class CompanyCreate(BaseModel):
+    company_name: str
+    resume: str
+    comment: str = ""
+
+
+class CommentCreate(BaseModel):
+    comment: str
+
+
+class AskRequest(BaseModel):
+    question: str
+    stream: bool = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.clients = create_clients()
+    app.state.manager = PortfolioManager()
+    # Chargement de l'index en arrière-plan: /ready passe à 200 une fois terminé
+    app.state.rag_service = get_rag_service()
+    try:
+        yield
+    finally:
+        for client in app.state.clients.values():
+            await client.aclose()
+
+
+app = FastAPI(title="Assistant Portfolio", lifespan=lifespan)
+
+
+def _document(doc) -> Dict:
+    return {"content": doc.page_content, "metadata": doc.metadata}
+
+
+def _rag(request: Request):
+    rag = request.app.state.rag_service.get(timeout=0)
+    if rag is None:
+        raise HTTPException(503, "Index du portfolio en cours de chargement")
+    return rag
+
+
+async def search_async(request: Request, query: str, num_results: int = 1,
+                       refresh: bool = False) -> Tuple[List[str], str]:
+    """Équivalent async de web_search (même cache disque)"""
+    with metrics.span("web_search", cache="hit") as span:
+        if not refresh:
+            cached = await asyncio.to_thread(cached_search, query, num_results)
+            if cached is not None:
+                return cached
+        span.label(cache="miss")
+        try:
+            response = await request.app.state.clients["google"].get(
+                GOOGLE_API_URL, params=search_params(query, num_results), timeout=REQUEST_TIMEOUT
+            )
+            return await asyncio.to_thread(parse_search_response, query, num_results, response.json())
+        except Exception as e:
+            span.label(cache="error")
+            return [], f"Erreur de recherche: {str(e)}"
+
+
+async def generate_resume_async(request: Request, company_name: str, search_results: str,
+                                scraped_content: str = "") -> str:
+    """Équivalent async de generate_resume (classe research de l'ordonnanceur Ollama)"""
+    payload = await asyncio.to_thread(resume_payload, company_name, search_results, scraped_content)
+    try:
+        async with get_scheduler().slot_async():
+            with metrics.span("llm_generate", source="resume"):
+                response = await request.app.state.clients["ollama"].post(
+                    OLLAMA_API_URL, json=payload, timeout=OLLAMA_TIMEOUT
+                )
+        chunk = response.json()
+        metrics.observe_generation("resume", chunk)
+        return parse_resume_response(chunk)
+    except Exception as e:
+        return f"Erreur lors de la génération du résumé: {str(e)}"
+
+
+@app.get("/health")
+async def health():
+    """Vivacité: le processus répond"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready(request: Request):
+    """Disponibilité: index chargé; état des disjoncteurs, de l'ordonnanceur Ollama et des navigateurs"""
+    status = request.app.state.rag_service.health()
+    status["upstreams"] = {name: client.breaker.state for name, client in request.app.state.clients.items()}
+    status["ollama"] = get_scheduler().stats()
+    status["browsers"] = get_browser_pool().health()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+async def prometheus_metrics(request: Request):
+    """Histogrammes par étape, état de l'ordonnanceur Ollama, des navigateurs et du scraping, au format Prometheus"""
+    if not metrics.enabled():
+        raise HTTPException(404, "Métriques désactivées (METRICS_ENABLED=false)")
+    for priority_class, stats in get_scheduler().stats()["classes"].items():
+        metrics.set_gauge("ollama_in_flight", stats["in_flight"], "Requêtes Ollama en cours", priority=priority_class)
+        metrics.set_gauge("ollama_queued", stats["queued"], "Requêtes Ollama en attente", priority=priority_class)
+    metrics.set_gauge("rag_ready", int(request.app.state.rag_service.ready), "Index RAG chargé")
+    for name, value in get_browser_pool().health().items():
+        metrics.set_gauge(f"browser_pool_{name}", value, "État du pool de navigateurs Playwright")
+    scrape = scrape_metrics.snapshot()
+    metrics.set_gauge("scrape_pages", scrape["pages"], "Pages chargées par le navigateur")
+    metrics.set_gauge("scrape_blocked_requests", scrape["blocked_requests"], "Requêtes bloquées (ressources, analytics)")
+    metrics.set_gauge("scrape_allowed_requests", scrape["allowed_requests"], "Requêtes autorisées")
+    metrics.set_gauge("scrape_avg_wait_ms", scrape["avg_wait_ms"], "Attente moyenne de page prête (ms)")
+    metrics.set_gauge("scrape_saved_ms_total", scrape["saved_ms_total"], "Temps gagné sur l'attente fixe (ms)")
+    for reason, count in scrape["ready_by"].items():
+        metrics.set_gauge("scrape_ready_pages", count, "Pages par condition de page prête", reason=reason)
+    return PlainTextResponse(metrics.export_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/research")
+async def research(body: ResearchRequest, request: Request):
+    """Recherche + scraping + résumé, sans ajout au portefeuille"""
+    num_results = SCRAPE_NUM_URLS if body.scrape else 1
+    urls, search_results = await search_async(request, body.company_name, num_results, body.refresh)
+    if not urls and search_results.startswith(SEARCH_ERROR_PREFIX):
+        raise HTTPException(502, search_results)
+
+    scraped_content = ""
+    if body.scrape and urls:
+        scraped_content = await scrape_urls_async(urls[:SCRAPE_NUM_URLS], refresh=body.refresh)
+
+    resume = await generate_resume_async(request, body.company_name, search_results, scraped_content)
+    if resume.startswith(RESUME_ERROR_PREFIXES):
+        raise HTTPException(502, resume)
+    return {"company_name": body.company_name, "urls": urls, "resume": resume}
+
+
+@app.get("/companies")
+async def list_companies(request: Request):
+    return await asyncio.to_thread(request.app.state.manager.get_all_companies)
+
+
+@app.get("/companies/{company_name}")
+async def get_company(company_name: str, request: Request):
+    company = await asyncio.to_thread(request.app.state.manager.get_company, company_name)
+    if company is None:
+        raise HTTPException(404, f"Entreprise inconnue: {company_name}")
+    return company
+
+
+@app.post("/companies", status_code=201)
+async def add_company(body: CompanyCreate, request: Request):
+    manager = request.app.state.manager
+    if await asyncio.to_thread(manager.company_exists, body.company_name):
+        raise HTTPException(409, f"Entreprise déjà présente: {body.company_name}")
+    if not await asyncio.to_thread(manager.add_company, body.company_name, body.resume, body.comment):
+        raise HTTPException(500, "Erreur lors de l'ajout")
+    # Index mis à jour en arrière-plan (seule la nouvelle entreprise est embarquée)
+    request.app.state.rag_service.request_refresh()
+    return {"company_name": body.company_name}
+
+
+@app.post("/companies/{company_name}/comments", status_code=201)
+async def add_comment(company_name: str, body: CommentCreate, request: Request):
+    manager = request.app.state.manager
+    if not await asyncio.to_thread(manager.company_exists, company_name):
+        raise HTTPException(404, f"Entreprise inconnue: {company_name}")
+    await asyncio.to_thread(manager.add_comment, company_name, body.comment)
+    request.app.state.rag_service.request_refresh()
+    return {"company_name": company_name, "comment": body.comment}
+
+
+@app.get("/search")
+async def search(request: Request, q: str, k: int = Query(3, ge=1, le=20),
+                 mode: str = Query("hybrid", pattern="^(hybrid|keyword|vector)$")):
+    rag = _rag(request)
+    documents = await asyncio.to_thread(rag.search, q, k, mode)
+    return [_document(doc) for doc in documents]
+
+
+async def _ask_events(request: Request, rag, question: str) -> AsyncIterator[str]:
+    """Événements de ask_stream en NDJSON: {"sources": [...]}, des {"token": ...} puis {"done": true}"""
+    try:
+        async for event in iterate_in_threadpool(rag.ask_stream(question)):
+            if "sources" in event:
+                event = {"sources": [_document(doc) for doc in event["sources"]]}
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+        return
+    yield json.dumps({"done": True}) + "\n"
+
+
+@app.post("/ask")
+async def ask(body: AskRequest, request: Request):
+    rag = _rag(request)
+    if body.stream:
+        return StreamingResponse(_ask_events(request, rag, body.question), media_type="application/x-ndjson")
+    response = await asyncio.to_thread(rag.ask, body.question)
+    return {"answer": response["answer"], "sources": [_document(doc) for doc in response["sources"]]}
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open(request: Request, exc: CircuitOpenError):
+    return JSONResponse({"detail": str(exc)}, status_code=503)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Dict, Optional
+import httpx
+from config import HTTP_POOL_SIZE, HTTP_MAX_RETRIES, REQUEST_TIMEOUT
+from src.http_client import TRANSIENT_STATUS, CircuitOpenError, _retry_after, get_client
+
+
+class AsyncHttpClient:
+    """Équivalent asyncio (httpx) de HttpClient pour un service distant
+
+    Mêmes règles de nouvel essai que le client synchrone, dont il partage le
+    disjoncteur: les appels de l'API et ceux des workers voient le même état
+    du service distant.
+    """
+
+    def __init__(self, name: str, pool_size: int = HTTP_POOL_SIZE, max_retries: int = HTTP_MAX_RETRIES,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.name = name
+        self.max_retries = max_retries
+        self.sync = get_client(name)
+        self.breaker = self.sync.breaker
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def request(self, method: str, url: str, stream: bool = False,
+                      max_retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        """Comme httpx.AsyncClient.request; avec stream=True, l'appelant ferme la réponse (aclose)"""
+        retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Service {self.name} indisponible (circuit ouvert)")
+            try:
+                response = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                if attempt == retries:
+                    raise
+                delay = self.sync._backoff(attempt)
+                reason = str(e) or type(e).__name__
+            else:
+                if response.status_code not in TRANSIENT_STATUS:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                retry_after = _retry_after(response)
+                if attempt == retries or (retry_after is not None and retry_after > self.sync.retry_after_max):
+                    return response
+                delay = retry_after if retry_after is not None else self.sync._backoff(attempt)
+                reason = f"HTTP {response.status_code}"
+                await response.aclose()
+            print(f"{self.name}: erreur transitoire ({reason}), nouvel essai dans {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def create_clients() -> Dict[str, AsyncHttpClient]:
+    """Clients async des services distants, à créer dans la boucle qui les utilise"""
+    return {name: AsyncHttpClient(name) for name in ("google", "ollama")}
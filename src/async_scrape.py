@@ -0,0 +1,134 @@
+import asyncio
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+from config import (
+    SCRAPE_PER_HOST, SCRAPE_CONCURRENCY, SCRAPE_DEADLINE, SCRAPE_DEDUP_THRESHOLD, SCRAPE_CONTEXT_MAX_CHARS
+)
+from src.browser import get_browser_pool
+from src.fetcher import cached_page, domain_tiers, extract_page, scrape_http, store_page
+from src.scrape_policy import host_of
+
+SHINGLE_SIZE = 5
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Exécuteur dédié au chemin HTTP: asyncio.run n'attend pas ses threads, une page
+# abandonnée à l'échéance ne retarde donc pas le retour
+_http_executor = ThreadPoolExecutor(max_workers=SCRAPE_CONCURRENCY, thread_name_prefix="scrape-http")
+
+
+async def _scrape_one(url: str, host_limit: asyncio.Semaphore,
+                      global_limit: asyncio.Semaphore, refresh: bool = False) -> str:
+    async with global_limit, host_limit:
+        loop = asyncio.get_running_loop()
+        content, stale = await loop.run_in_executor(_http_executor, cached_page, url, refresh)
+        if content is None and domain_tiers.get(url) != "browser":
+            content = await loop.run_in_executor(_http_executor, scrape_http, url, stale)
+            if content is not None:
+                domain_tiers.record(url, "http")
+
+        if content is None:
+            # Navigateurs persistants du pool partagé (ceux de scrape_url), sans lancer de Chromium par appel
+            content = await asyncio.wrap_future(get_browser_pool().submit(lambda page: extract_page(page, url)))
+            domain_tiers.record(url, "browser")
+            await loop.run_in_executor(_http_executor, store_page, url, content, "browser")
+        return content.strip()
+
+
+async def fetch_pages(urls: List[str], deadline: float = SCRAPE_DEADLINE,
+                      per_host: int = SCRAPE_PER_HOST, concurrency: int = SCRAPE_CONCURRENCY,
+                      refresh: bool = False) -> List[Tuple[str, str]]:
+    """Scrape les URLs en parallèle; renvoie (url, texte) dans l'ordre des URLs
+
+    Les pages non terminées à l'échéance globale sont abandonnées.
+    """
+    global_limit = asyncio.Semaphore(max(1, concurrency))
+    host_limits: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max(1, per_host)))
+    start = time.monotonic()
+    tasks = [
+        asyncio.create_task(_scrape_one(url, host_limits[host_of(url)], global_limit, refresh))
+        for url in urls
+    ]
+    if not tasks:
+        return []
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    pages = []
+    for url, task in zip(urls, tasks):
+        if task.cancelled():
+            print(f"Scraping abandonné (échéance de {deadline:.0f}s): {url}")
+        elif task.exception() is not None:
+            print(f"Erreur de scraping pour {url}: {task.exception()}")
+        elif task.result():
+            pages.append((url, task.result()))
+    print(f"{len(pages)}/{len(urls)} pages scrapées en {time.monotonic() - start:.1f}s")
+    return pages
+
+
+def _shingles(text: str) -> Set[int]:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {hash(" ".join(words))} if words else set()
+    return {hash(" ".join(words[i:i + SHINGLE_SIZE])) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def dedupe_pages(pages: List[Tuple[str, str]],
+                 threshold: float = SCRAPE_DEDUP_THRESHOLD) -> List[Tuple[str, str]]:
+    """Retire les pages quasi identiques à une page mieux classée (Jaccard sur des 5-grammes de mots)"""
+    kept = []
+    kept_shingles: List[Set[int]] = []
+    for url, text in pages:
+        shingles = _shingles(text)
+        if not shingles:
+            continue
+        duplicate = any(
+            len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles
+        )
+        if duplicate:
+            print(f"Page en double ignorée: {url}")
+            continue
+        kept.append((url, text))
+        kept_shingles.append(shingles)
+    return kept
+
+
+def merge_pages(pages: List[Tuple[str, str]], max_chars: int = SCRAPE_CONTEXT_MAX_CHARS) -> str:
+    """Fusionne les pages dans max_chars caractères, partagés équitablement entre elles
+
+    Une page plus courte que sa part laisse le reste aux autres.
+    """
+    headers = [f"Source: {url}\n" for url, _ in pages]
+    # En-têtes, séparateurs et "..." de troncature comptent dans le budget
+    budget = max_chars - sum(len(h) + 5 for h in headers)
+    shares: Dict[int, int] = {}
+    remaining = sorted(range(len(pages)), key=lambda i: len(pages[i][1]))
+    while remaining:
+        share = max(0, budget) // len(remaining)
+        i = remaining.pop(0)
+        shares[i] = min(len(pages[i][1]), share)
+        budget -= shares[i]
+
+    sections = []
+    for i, (url, text) in enumerate(pages):
+        if shares[i] <= 0:
+            continue
+        body = text if len(text) <= shares[i] else text[:shares[i]] + "..."
+        sections.append(headers[i] + body)
+    return "\n\n".join(sections)
+
+
+async def scrape_urls_async(urls: List[str], max_chars: int = SCRAPE_CONTEXT_MAX_CHARS,
+                            deadline: float = SCRAPE_DEADLINE, refresh: bool = False) -> str:
+    pages = await fetch_pages(urls, deadline=deadline, refresh=refresh)
+    return merge_pages(dedupe_pages(pages), max_chars)
+
+
+def scrape_urls(urls: List[str], max_chars: int = SCRAPE_CONTEXT_MAX_CHARS,
+                deadline: float = SCRAPE_DEADLINE, refresh: bool = False) -> str:
+    """Scrape plusieurs URLs en parallèle et renvoie un contexte fusionné (hors boucle asyncio)"""
+    return asyncio.run(scrape_urls_async(urls, max_chars, deadline, refresh))
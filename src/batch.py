@@ -0,0 +1,265 @@
+"""Ajout en lot d'entreprises au portefeuille à partir d'un fichier de noms.
+
+Le pipeline enchaîne trois étapes reliées par des files bornées, chacune avec
+son propre nombre de workers: recherche Google et scraping (I/O, nombreux
+workers) puis génération du résumé par Ollama (peu de workers). Les résultats
+sont enregistrés par lots dans le portefeuille, l'index vectoriel n'est mis à
+jour qu'une fois à la fin, et un fichier de reprise (JSON lines) permet de
+relancer un lot interrompu sans refaire les entreprises déjà traitées.
+
+Usage: python -m src.batch entreprises.txt [--checkpoint lot.jsonl] [--no-scrape] [--no-index]
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from config import (
+    SCRAPE_NUM_URLS, BATCH_SEARCH_WORKERS, BATCH_SCRAPE_WORKERS, BATCH_SUMMARY_WORKERS,
+    BATCH_QUEUE_SIZE, BATCH_COMMIT_SIZE
+)
+from src.manager import PortfolioManager
+from src.ollama_scheduler import BATCH, ollama_priority
+from src.web_search import (
+    web_search, scrape_top_results, generate_resume,
+    NO_RESULTS_MESSAGE, SEARCH_ERROR_PREFIX, SCRAPE_ERROR_PREFIX, RESUME_ERROR_PREFIXES
+)
+
+_STOP = object()
+
+
+def read_company_names(path: str) -> List[str]:
+    """Un nom par ligne; lignes vides, commentaires (#) et doublons ignorés"""
+    names = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            name = line.strip()
+            if not name or name.startswith("#") or name.lower() in seen:
+                continue
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+class Checkpoint:
+    """Journal de reprise: une ligne JSON par entreprise terminée (succès ou échec)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Dernière ligne tronquée par un arrêt brutal
+                        continue
+                    self.records[record['company_name'].lower()] = record
+
+    def done(self) -> List[Dict]:
+        return [r for r in self.records.values() if r['status'] == "done"]
+
+    def is_done(self, company_name: str) -> bool:
+        record = self.records.get(company_name.lower())
+        return record is not None and record['status'] == "done"
+
+    def write(self, record: Dict):
+        self.records[record['company_name'].lower()] = record
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class _Stage:
+    """Étape du pipeline: workers qui lisent une file bornée et écrivent dans la suivante"""
+
+    def __init__(self, name: str, func: Callable[[Dict], None], workers: int,
+                 inbox: "queue.Queue", outbox: "queue.Queue"):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.threads = [
+            threading.Thread(target=self._run, name=f"batch-{name}-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            job = self.inbox.get()
+            if job is _STOP:
+                break
+            # Une entreprise en échec traverse les étapes suivantes sans traitement
+            if not job.get('error'):
+                try:
+                    self.func(job)
+                except Exception as e:
+                    job['error'] = f"{self.name}: {e}"
+            self.outbox.put(job)
+
+    def finish(self):
+        """Arrête les workers une fois la file vidée (les signaux d'arrêt passent après les jobs)"""
+        for _ in self.threads:
+            self.inbox.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+
+def _search(job: Dict):
+    urls, search_results = web_search(job['company_name'], num_results=SCRAPE_NUM_URLS if job['scrape'] else 1)
+    if not urls and search_results.startswith(SEARCH_ERROR_PREFIX):
+        job['error'] = search_results
+        return
+    # Sans aucun résultat, le résumé serait inventé: pas de génération
+    if not urls or search_results == NO_RESULTS_MESSAGE:
+        job['error'] = NO_RESULTS_MESSAGE
+        return
+    job['urls'] = urls
+    job['search_results'] = search_results
+
+
+def _scrape(job: Dict):
+    scraped_content = scrape_top_results(job['urls']) if job['scrape'] else ""
+    # Une page illisible n'empêche pas le résumé à partir des extraits de recherche
+    if scraped_content.startswith(SCRAPE_ERROR_PREFIX):
+        print(f"{job['company_name']}: {scraped_content}")
+        scraped_content = ""
+    job['scraped_content'] = scraped_content
+
+
+def _summarize(job: Dict):
+    # Classe batch: les questions et recherches interactives passent devant
+    with ollama_priority(BATCH):
+        resume = generate_resume(job['company_name'], job['search_results'], job['scraped_content'])
+    if resume.startswith(RESUME_ERROR_PREFIXES):
+        job['error'] = resume
+        return
+    job['resume'] = resume
+    job['researched_at'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+
+
+def ingest_companies(company_names: List[str], checkpoint_path: str, scrape: bool = True,
+                     update_index: bool = True, manager: Optional[PortfolioManager] = None,
+                     search_workers: int = BATCH_SEARCH_WORKERS,
+                     scrape_workers: int = BATCH_SCRAPE_WORKERS,
+                     summary_workers: int = BATCH_SUMMARY_WORKERS,
+                     queue_size: int = BATCH_QUEUE_SIZE,
+                     commit_size: int = BATCH_COMMIT_SIZE) -> Dict:
+    """Recherche, résume et ajoute au portefeuille une liste d'entreprises
+
+    Retourne un bilan {added, failed, skipped, elapsed}.
+    """
+    start = time.monotonic()
+    manager = manager or PortfolioManager()
+    checkpoint = Checkpoint(checkpoint_path)
+    report = {"added": 0, "failed": 0, "skipped": 0, "elapsed": 0.0}
+
+    # Résumés déjà produits lors d'un lancement précédent mais peut-être pas enregistrés
+    report["added"] += manager.add_companies([
+        {'company_name': r['company_name'], 'resume': r['resume'], 'last_researched': r.get('researched_at', '')}
+        for r in checkpoint.done()
+    ])
+
+    todo = []
+    for name in company_names:
+        if checkpoint.is_done(name) or manager.company_exists(name):
+            report["skipped"] += 1
+        else:
+            todo.append(name)
+    print(f"Lot: {len(todo)} entreprise(s) à traiter, {report['skipped']} déjà présente(s)")
+
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(4)]
+    stages = [
+        _Stage("search", _search, search_workers, queues[0], queues[1]),
+        _Stage("scrape", _scrape, scrape_workers, queues[1], queues[2]),
+        _Stage("summarize", _summarize, summary_workers, queues[2], queues[3]),
+    ]
+    results = queues[3]
+    pending_rows: List[Dict] = []
+
+    def commit():
+        if pending_rows:
+            report["added"] += manager.add_companies(pending_rows)
+            pending_rows.clear()
+
+    def collect():
+        while True:
+            job = results.get()
+            if job is _STOP:
+                break
+            if job.get('error'):
+                report["failed"] += 1
+                print(f"Échec pour {job['company_name']}: {job['error']}")
+                checkpoint.write({'company_name': job['company_name'], 'status': "error", 'error': job['error']})
+                continue
+            # Le journal de reprise est écrit avant l'ajout au portefeuille
+            checkpoint.write({
+                'company_name': job['company_name'], 'status': "done", 'resume': job['resume'],
+                'researched_at': job['researched_at']
+            })
+            pending_rows.append({
+                'company_name': job['company_name'], 'resume': job['resume'],
+                'last_researched': job['researched_at']
+            })
+            if len(pending_rows) >= commit_size:
+                commit()
+        commit()
+
+    collector = threading.Thread(target=collect, name="batch-collector", daemon=True)
+    collector.start()
+    for stage in stages:
+        stage.start()
+
+    for name in todo:
+        queues[0].put({'company_name': name, 'scrape': scrape})
+    for stage in stages:
+        stage.finish()
+    results.put(_STOP)
+    collector.join()
+
+    if update_index and report["added"]:
+        # Import tardif: langchain/FAISS ne sont chargés que si l'index doit être mis à jour
+        from src.retrieval import PortfolioRAG
+        PortfolioRAG().build_vectorstore()
+
+    report["elapsed"] = time.monotonic() - start
+    print(f"Lot terminé en {report['elapsed']:.1f}s: {report['added']} ajoutée(s), "
+          f"{report['failed']} échec(s), {report['skipped']} ignorée(s)")
+    return report
+
+
+def ingest_file(path: str, checkpoint_path: Optional[str] = None, **kwargs) -> Dict:
+    """ingest_companies sur un fichier de noms; reprise dans <fichier>.checkpoint.jsonl par défaut"""
+    return ingest_companies(read_company_names(path), checkpoint_path or f"{path}.checkpoint.jsonl", **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("companies_file", help="Fichier texte, un nom d'entreprise par ligne")
+    parser.add_argument("--checkpoint", help="Fichier de reprise (défaut: <fichier>.checkpoint.jsonl)")
+    parser.add_argument("--no-scrape", action="store_true", help="Résumé à partir des seuls extraits de recherche")
+    parser.add_argument("--no-index", action="store_true", help="Ne pas mettre à jour l'index vectoriel")
+    parser.add_argument("--search-workers", type=int, default=BATCH_SEARCH_WORKERS)
+    parser.add_argument("--scrape-workers", type=int, default=BATCH_SCRAPE_WORKERS)
+    parser.add_argument("--summary-workers", type=int, default=BATCH_SUMMARY_WORKERS)
+    args = parser.parse_args()
+
+    ingest_file(
+        args.companies_file, args.checkpoint, scrape=not args.no_scrape, update_index=not args.no_index,
+        search_workers=args.search_workers, scrape_workers=args.scrape_workers,
+        summary_workers=args.summary_workers
+    )
+
+
+if __name__ == "__main__":
+    main()
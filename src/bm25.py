@@ -0,0 +1,79 @@
+import math
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+from langchain_classic.schema import Document
+from src.entities import normalize
+
+STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "de", "du", "d", "l", "et", "ou", "en", "au", "aux",
+    "a", "est", "sont", "pour", "par", "sur", "dans", "avec", "qui", "que", "quoi", "quel", "quelle",
+    "quels", "quelles", "ce", "ces", "se", "sa", "son", "ses", "il", "elle", "ils", "the", "of",
+    "and", "or", "to", "in", "is", "for", "on", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in normalize(text).split() if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Index inversé BM25 en mémoire sur les documents du portefeuille"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Document] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        self.avg_length = 0.0
+
+    def build(self, documents: List[Document], text: Optional[Callable[[Document], str]] = None):
+        """Indexe text(doc) (par défaut page_content) pour chaque document"""
+        text = text or (lambda doc: doc.page_content)
+        self.documents = list(documents)
+        self.postings, self.lengths = {}, []
+        for i, doc in enumerate(self.documents):
+            counts = Counter(tokenize(text(doc)))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((i, tf))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        n = len(self.documents)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.documents[i], score) for i, score in ranked]
+
+    def is_discriminative(self, query: str, max_df: float) -> bool:
+        """Vrai si chaque terme de la requête est indexé et présent dans au plus max_df des documents
+
+        Un terme présent presque partout (ex: « entreprise ») fait correspondre
+        BM25 sans départager les documents: la recherche vectorielle reste alors utile.
+        """
+        terms = set(tokenize(query))
+        limit = max(1, int(max_df * len(self.documents)))
+        return bool(terms) and all(0 < len(self.postings.get(term, ())) <= limit for term in terms)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], key, k: int = 60) -> List[Document]:
+    """Fusionne plusieurs classements: score = somme de 1 / (k + rang)"""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_key = key(doc)
+            documents.setdefault(doc_key, doc)
+            scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (k + rank)
+    return [documents[doc_key] for doc_key in sorted(scores, key=scores.get, reverse=True)]
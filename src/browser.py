@@ -0,0 +1,205 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from playwright.sync_api import sync_playwright, Error as PlaywrightError, Page
+from config import SCRAPE_POOL_SIZE, SCRAPE_RECYCLE_PAGES
+
+# Après un échec de démarrage de Playwright, les tâches échouent aussitôt pendant ce délai
+START_RETRY_DELAY = 30
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class _BrowserWorker(threading.Thread):
+    """Thread propriétaire d'un Chromium headless et d'un contexte réutilisé
+
+    L'API sync de Playwright est liée au thread qui l'a démarrée: chaque
+    worker garde son navigateur et exécute les tâches qu'on lui confie.
+    """
+
+    def __init__(self, pool: "BrowserPool", index: int):
+        super().__init__(name=f"browser-worker-{index}", daemon=True)
+        self.pool = pool
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.pages_served = 0
+        self.total_pages = 0
+        # Relances planifiées (après max_pages pages) et après un plantage du navigateur
+        self.recycles = 0
+        self.restarts = 0
+
+    def _healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    def _close_browser(self):
+        try:
+            if self.browser is not None:
+                self.browser.close()
+        except PlaywrightError:
+            pass
+        self.browser = None
+        self.context = None
+
+    def _ensure_browser(self):
+        if self._healthy() and self.pages_served < self.pool.max_pages:
+            return
+        if self.browser is not None:
+            if self._healthy():
+                self.recycles += 1
+            else:
+                self.restarts += 1
+        self._close_browser()
+        self.browser = self.playwright.chromium.launch(headless=True)
+        self.context = self.browser.new_context(user_agent=USER_AGENT)
+        self.pages_served = 0
+
+    def run(self):
+        try:
+            self.playwright = sync_playwright().start()
+        except Exception as e:
+            self.pool._worker_failed(self, e)
+            return
+        try:
+            while True:
+                item = self.pool.tasks.get()
+                if item is None:
+                    break
+                task, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self._ensure_browser()
+                    page = self.context.new_page()
+                    try:
+                        result = task(page)
+                    finally:
+                        self.pages_served += 1
+                        self.total_pages += 1
+                        try:
+                            page.close()
+                        except PlaywrightError:
+                            pass
+                    future.set_result(result)
+                except Exception as e:
+                    # Navigateur planté: il sera relancé à la prochaine tâche
+                    if self.browser is not None and not self._healthy():
+                        self.restarts += 1
+                        self._close_browser()
+                    future.set_exception(e)
+        finally:
+            self._close_browser()
+            self.playwright.stop()
+
+
+class BrowserPool:
+    """Pool de navigateurs Playwright persistants, partagé par tout le processus
+
+    Chaque tâche reçoit une page neuve dans un contexte réutilisé; le
+    navigateur est relancé après max_pages pages ou s'il ne répond plus.
+    """
+
+    def __init__(self, size: int = SCRAPE_POOL_SIZE, max_pages: int = SCRAPE_RECYCLE_PAGES):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.tasks: "queue.Queue" = queue.Queue()
+        self.workers: List[_BrowserWorker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.start_errors = 0
+        self._start_error: Optional[Exception] = None
+        self._start_failed_at = 0.0
+
+    def _start(self):
+        # Appelé sous self._lock
+        if self._closed:
+            raise RuntimeError("Pool de navigateurs arrêté")
+        self.workers = [w for w in self.workers if w.is_alive()]
+        while len(self.workers) < self.size:
+            worker = _BrowserWorker(self, len(self.workers))
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, task: Callable[[Page], Any]) -> Future:
+        """Exécute task(page) sur un navigateur du pool
+
+        Si Playwright n'a pas pu démarrer, la tâche échoue aussitôt (jusqu'à la
+        prochaine tentative, START_RETRY_DELAY secondes plus tard) au lieu
+        d'attendre un worker qui n'existe pas.
+        """
+        future: Future = Future()
+        # Sous le verrou: un worker qui échoue à démarrer ne peut pas vider la file entre les deux
+        with self._lock:
+            alive = any(w.is_alive() for w in self.workers)
+            if (not alive and self._start_error is not None
+                    and time.monotonic() - self._start_failed_at < START_RETRY_DELAY):
+                future.set_exception(self._start_error)
+                return future
+            self._start()
+            self.tasks.put((task, future))
+        return future
+
+    def _worker_failed(self, worker: _BrowserWorker, error: Exception):
+        """Worker dont Playwright n'a pas démarré: sans autre worker, les tâches en file échouent"""
+        print(f"Échec du démarrage de Playwright ({worker.name}): {error}")
+        with self._lock:
+            self.start_errors += 1
+            self._start_error = error
+            self._start_failed_at = time.monotonic()
+            if worker in self.workers:
+                self.workers.remove(worker)
+            if any(w.is_alive() for w in self.workers if w is not threading.current_thread()):
+                return
+            while True:
+                try:
+                    item = self.tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    continue
+                _, future = item
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+
+    def run(self, task: Callable[[Page], Any], timeout: Optional[float] = None) -> Any:
+        return self.submit(task).result(timeout=timeout)
+
+    def health(self) -> Dict:
+        """Workers vivants, navigateurs connectés, pages servies, relances et tâches en attente"""
+        return {
+            "workers": sum(w.is_alive() for w in self.workers),
+            "browsers_connected": sum(w._healthy() for w in self.workers),
+            "pages_served": sum(w.total_pages for w in self.workers),
+            "recycles": sum(w.recycles for w in self.workers),
+            "restarts": sum(w.restarts for w in self.workers),
+            "start_errors": self.start_errors,
+            "queued": self.tasks.qsize(),
+        }
+
+    def shutdown(self, timeout: float = 10):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self.workers)
+        for _ in workers:
+            self.tasks.put(None)
+        for worker in workers:
+            worker.join(timeout=timeout)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Pool partagé, créé au premier usage et fermé à l'arrêt du processus"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.shutdown)
+        return _pool
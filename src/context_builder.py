@@ -0,0 +1,126 @@
+import re
+from typing import Dict, List, Tuple
+from langchain_classic.schema import Document
+from config import RESUME_CONTEXT_TOKENS, RESUME_SNIPPET_SHARE
+from src.bm25 import BM25Index
+from src.entities import normalize
+from src.tokens import count_tokens, truncate_to_tokens
+
+# Termes qui signalent un paragraphe de présentation d'entreprise
+PROFILE_TERMS = (
+    "entreprise société groupe activité secteur produits services clients fondée créée siège "
+    "chiffre affaires salariés employés marché leader spécialisée company founded headquarters "
+    "products services customers revenue employees"
+)
+
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|javascript|tous droits réservés|all rights reserved|©|mentions légales|politique de confidentialité"
+    r"|privacy policy|terms of (use|service)|conditions générales|newsletter|abonnez-vous|subscribe"
+    r"|se connecter|connexion|log ?in|sign ?(in|up)|créer un compte|mot de passe|panier|partager sur"
+    r"|share on|suivez-nous|follow us|aller au contenu|skip to (main )?content|retour en haut|back to top",
+    re.IGNORECASE
+)
+SOURCE_HEADER_PATTERN = re.compile(r"^Source: \S+$")
+
+# Une ligne plus courte est un élément de menu ou un titre isolé, sauf si elle contient des chiffres
+# ou finit comme une phrase; au-delà, les éléments de liste (« Siège à Leiden ») sont gardés
+MIN_LINE_WORDS = 3
+SENTENCE_END = (".", "!", "?")
+# Les lignes gardées sont regroupées en paragraphes d'au moins cette taille
+MIN_PARAGRAPH_CHARS = 200
+MAX_PARAGRAPH_CHARS = 800
+# Léger avantage aux paragraphes en début de page (présentation en tête)
+POSITION_WEIGHT = 0.5
+
+
+def _is_boilerplate(line: str) -> bool:
+    if SOURCE_HEADER_PATTERN.match(line):
+        return True
+    words = line.split()
+    if len(words) < MIN_LINE_WORDS and not line.endswith(SENTENCE_END) and not any(c.isdigit() for c in line):
+        return True
+    if len(words) < 20 and BOILERPLATE_PATTERN.search(line):
+        return True
+    letters = sum(c.isalpha() for c in line)
+    return letters < len(line) * 0.5
+
+
+def clean_lines(text: str, seen: set) -> List[str]:
+    """Lignes utiles du texte: sans doublons (normalisés, partagés via `seen`) ni boilerplate"""
+    lines = []
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line or _is_boilerplate(line):
+            continue
+        key = normalize(line)
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+
+def _paragraphs(lines: List[str]) -> List[str]:
+    paragraphs = []
+    current = ""
+    for line in lines:
+        if current and len(current) + len(line) > MAX_PARAGRAPH_CHARS:
+            paragraphs.append(current)
+            current = ""
+        current = f"{current} {line}" if current else line
+        if len(current) >= MIN_PARAGRAPH_CHARS:
+            paragraphs.append(current)
+            current = ""
+    if current:
+        paragraphs.append(current)
+    return paragraphs
+
+
+def rank_paragraphs(company_name: str, paragraphs: List[str]) -> List[int]:
+    """Indices des paragraphes pertinents (BM25 nom + profil), du plus au moins pertinent
+
+    Sans aucun paragraphe pertinent, l'ordre de la page est conservé.
+    """
+    index = BM25Index()
+    index.build([Document(page_content=p, metadata={"i": i}) for i, p in enumerate(paragraphs)])
+    scores: Dict[int, float] = {}
+    # Le nom de l'entreprise compte deux fois: dans la requête profil et seul
+    for query in (f"{company_name} {PROFILE_TERMS}", company_name):
+        for doc, score in index.search(query, k=len(paragraphs)):
+            scores[doc.metadata["i"]] = scores.get(doc.metadata["i"], 0.0) + score
+    if not scores:
+        return list(range(len(paragraphs)))
+    return sorted(scores, key=lambda i: scores[i] + POSITION_WEIGHT / (1 + i), reverse=True)
+
+
+def build_resume_context(company_name: str, search_results: str, scraped_content: str = "",
+                         max_tokens: int = RESUME_CONTEXT_TOKENS) -> Tuple[str, str]:
+    """(extraits de recherche, contenu des pages) nettoyés et tenant dans max_tokens tokens
+
+    Les extraits de recherche, courts et denses, passent en premier (au plus
+    RESUME_SNIPPET_SHARE du budget); le reste est rempli par les paragraphes
+    des pages les plus pertinents, restitués dans leur ordre d'origine.
+    """
+    seen: set = set()
+    snippet_lines = [line for line in (" ".join(l.split()) for l in search_results.splitlines()) if line]
+    snippets = []
+    for line in snippet_lines:
+        key = normalize(line)
+        if key not in seen:
+            seen.add(key)
+            snippets.append(line)
+    snippet_text = truncate_to_tokens("\n\n".join(snippets), int(max_tokens * RESUME_SNIPPET_SHARE))
+    budget = max_tokens - count_tokens(snippet_text)
+
+    paragraphs = _paragraphs(clean_lines(scraped_content, seen)) if scraped_content else []
+    selected = []
+    for i in rank_paragraphs(company_name, paragraphs) if paragraphs else []:
+        tokens = count_tokens(paragraphs[i]) + 1
+        if tokens <= budget:
+            selected.append(i)
+            budget -= tokens
+    page_text = "\n".join(paragraphs[i] for i in sorted(selected))
+
+    print(f"Contexte du résumé: {max_tokens - budget}/{max_tokens} tokens, "
+          f"{len(selected)}/{len(paragraphs)} paragraphe(s) retenu(s)")
+    return snippet_text, page_text
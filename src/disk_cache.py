@@ -0,0 +1,161 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+from config import CACHE_FILE, CACHE_MAX_MB
+
+
+class CacheEntry:
+    def __init__(self, value: Any, expires_at: float):
+        self.value = value
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class DiskCache:
+    """Cache persistant SQLite: valeurs JSON compressées (zlib), TTL par entrée, éviction LRU
+
+    Les entrées expirées restent disponibles (get(..., allow_stale=True)) pour une
+    revalidation conditionnelle, jusqu'à ce que la limite de taille les évince.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+    -- Taille totale tenue à jour par triggers: set() n'a pas à sommer toute la table,
+    -- et le total reste juste quand plusieurs processus écrivent dans le même fichier
+    CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        size INTEGER NOT NULL
+    );
+    CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries
+    BEGIN UPDATE totals SET size = size + new.size WHERE id = 1; END;
+    CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries
+    BEGIN UPDATE totals SET size = size - old.size WHERE id = 1; END;
+    CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries
+    BEGIN UPDATE totals SET size = size + new.size - old.size WHERE id = 1; END;
+    INSERT OR IGNORE INTO totals (id, size) SELECT 1, COALESCE(SUM(size), 0) FROM entries;
+    """
+
+    def __init__(self, path: str = CACHE_FILE, max_bytes: int = CACHE_MAX_MB * 1024 * 1024):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread (sqlite3 interdit le partage par défaut)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (not allow_stale and row[1] <= time.time()):
+            self.misses += 1
+            return None
+        with self._write_lock, conn:
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), namespace, key)
+            )
+        entry = CacheEntry(json.loads(zlib.decompress(row[0])), row[1])
+        if entry.fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        conn = self._connection()
+        with self._write_lock, conn:
+            # Upsert plutôt que INSERT OR REPLACE: le remplacement ne déclenche pas le trigger de suppression
+            conn.execute(
+                "INSERT INTO entries (namespace, key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (namespace, key, blob, len(blob), now + ttl, now)
+            )
+            self._evict(conn)
+
+    def touch(self, namespace: str, key: str, ttl: float):
+        """Prolonge une entrée revalidée (réponse 304) sans la réécrire"""
+        now = time.time()
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute(
+                "UPDATE entries SET expires_at = ?, accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now + ttl, now, namespace, key)
+            )
+
+    def delete(self, namespace: str, key: str):
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT size FROM totals WHERE id = 1").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for namespace, key, size in conn.execute(
+            "SELECT namespace, key, size FROM entries ORDER BY accessed_at"
+        ):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((namespace, key))
+            freed += size
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+
+    def stats(self) -> Dict:
+        conn = self._connection()
+        count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = conn.execute("SELECT size FROM totals WHERE id = 1").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DiskCache:
+    """Cache partagé par le processus, ouvert au premier usage"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache()
+        return _cache
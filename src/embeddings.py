@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Set
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config import (
+    EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB, EMBED_BATCH_SIZE, EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES, EMBED_TIMEOUT
+)
+from src import metrics
+from src.file_lock import file_lock
+from src.http_client import get_client
+from src.ollama_scheduler import BATCH, INTERACTIVE, current_priority, get_scheduler
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """Embeddings Ollama par lots, envoyés en parallèle sur un pool borné
+
+    Les textes sont découpés en lots de batch_size envoyés à /api/embed par
+    au plus `concurrency` requêtes simultanées; les erreurs transitoires
+    (connexion, timeout, 429/5xx) sont réessayées par le client HTTP partagé.
+    """
+
+    def __init__(self, model: str, base_url: str, batch_size: int = EMBED_BATCH_SIZE,
+                 concurrency: int = EMBED_CONCURRENCY, max_retries: int = EMBED_MAX_RETRIES,
+                 timeout: float = EMBED_TIMEOUT,
+                 progress: Optional[Callable[[int, int], None]] = None):
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/api/embed"
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.progress = progress or self._print_progress
+        # Même pool de connexions et même disjoncteur que la génération
+        self.client = get_client("ollama")
+
+    @staticmethod
+    def _print_progress(done: int, total: int):
+        print(f"Embeddings: {done}/{total}")
+
+    def _embed_batch(self, texts: List[str], priority_class: str) -> List[List[float]]:
+        # Nouveaux essais (connexion, timeout, 429/5xx) et disjoncteur gérés par le client partagé
+        with get_scheduler().slot(priority_class), metrics.span("embedding", priority=priority_class) as span:
+            span.set(texts=len(texts))
+            response = self.client.post(
+                self.url, json={"model": self.model, "input": texts}, timeout=self.timeout,
+                max_retries=self.max_retries
+            )
+        response.raise_for_status()
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"{len(embeddings)} embeddings reçus pour {len(texts)} textes")
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        # Indexation: classe batch sauf contexte contraire (lu ici, les threads du pool n'héritent pas du contexte)
+        priority_class = current_priority(BATCH)
+        if len(batches) == 1:
+            vectors = self._embed_batch(batches[0], priority_class)
+            self.progress(len(texts), len(texts))
+            return vectors
+
+        results: List[Optional[List[List[float]]]] = [None] * len(batches)
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+            futures = {executor.submit(self._embed_batch, batch, priority_class): i for i, batch in enumerate(batches)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                done += len(batches[i])
+                self.progress(done, len(texts))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Question d'un utilisateur: classe interactive sauf contexte contraire
+        return self._embed_batch([text], current_priority(INTERACTIVE))[0]
+
+
+class EmbeddingStore:
+    """Vecteurs float32 dans un fichier mappé en mémoire + journal d'index, avec éviction LRU
+
+    Chaque entrée occupe une ligne (slot) de vectors.f32; index.jsonl est un
+    journal en ajout seul: un en-tête {"dim": n} puis des lignes [clé, slot],
+    la dernière ligne d'un slot l'emporte. Quand la taille maximale est
+    atteinte, le slot le moins récemment utilisé est réattribué.
+
+    Le répertoire est partagé par l'application, l'API et le worker: les
+    écritures se font sous verrou fcntl exclusif, les lectures sous verrou
+    partagé, et chaque processus relit la fin du journal ajoutée par les autres
+    avant d'attribuer un slot. Le journal est réécrit (compacté) quand il
+    dépasse COMPACT_FACTOR fois le nombre d'entrées.
+    """
+
+    GROWTH_ROWS = 256
+    COMPACT_FACTOR = 4
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.vectors_file = os.path.join(directory, "vectors.f32")
+        self.index_file = os.path.join(directory, "index.jsonl")
+        self.lock_file = os.path.join(directory, "lock")
+        self.dim: Optional[int] = None
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.owners: Dict[int, str] = {}
+        self.free_slots: Set[int] = set()
+        self.rows = 0
+        self._vectors: Optional[np.memmap] = None
+        # Position lue dans le journal, et inode pour détecter une compaction par un autre processus
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._records = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, file_lock(self.lock_file):
+            self._migrate()
+            self._refresh()
+
+    @property
+    def capacity(self) -> int:
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    def _migrate(self):
+        # Ancien format: index.json réécrit en entier à chaque ajout
+        legacy = os.path.join(self.directory, "index.json")
+        if not os.path.exists(legacy) or os.path.exists(self.index_file):
+            return
+        try:
+            with open(legacy, 'r') as f:
+                index = json.load(f)
+            self._write_index(index["dim"], index["entries"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ancien index d'embeddings illisible ({e}), ignoré")
+        os.remove(legacy)
+
+    def _reset(self):
+        self.dim, self.rows = None, 0
+        self.entries, self.owners, self.free_slots = OrderedDict(), {}, set()
+        self._offset, self._inode, self._records = 0, None, 0
+        self._vectors = None
+
+    def _apply(self, record):
+        if isinstance(record, dict):
+            self.dim = record["dim"]
+            return
+        key, slot = record
+        self._records += 1
+        previous_owner = self.owners.get(slot)
+        if previous_owner is not None and previous_owner != key:
+            del self.entries[previous_owner]
+        previous_slot = self.entries.pop(key, None)
+        if previous_slot is not None and previous_slot != slot:
+            del self.owners[previous_slot]
+            if previous_slot < self.rows:
+                self.free_slots.add(previous_slot)
+        self.entries[key] = slot
+        self.owners[slot] = key
+        self.free_slots.discard(slot)
+
+    def _refresh(self):
+        """Applique les lignes ajoutées au journal par les autres processus (sous verrou fcntl)"""
+        try:
+            stat = os.stat(self.index_file)
+        except FileNotFoundError:
+            if self._inode is not None:
+                self._reset()
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # Journal compacté ou recréé ailleurs: relecture complète
+            self._reset()
+            self._inode = stat.st_ino
+        if stat.st_size > self._offset:
+            with open(self.index_file, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+            for line in data.splitlines():
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"Ligne illisible dans l'index d'embeddings ignorée ({e})")
+            self._offset = stat.st_size
+        if self.dim is None or not os.path.exists(self.vectors_file):
+            return
+        rows = os.path.getsize(self.vectors_file) // (self.dim * 4)
+        if rows != self.rows:
+            self.free_slots.update(slot for slot in range(self.rows, rows) if slot not in self.owners)
+            self.rows = rows
+            self._open()
+
+    def _open(self):
+        self._vectors = np.memmap(self.vectors_file, dtype=np.float32, mode='r+', shape=(self.rows, self.dim))
+
+    def _grow(self):
+        rows = min(self.capacity, self.rows + self.GROWTH_ROWS)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_file, 'ab') as f:
+            f.truncate(rows * self.dim * 4)
+        self.free_slots.update(range(self.rows, rows))
+        self.rows = rows
+        self._open()
+
+    def _append(self, records: List):
+        with open(self.index_file, 'ab') as f:
+            f.write(b"".join(json.dumps(record).encode('utf-8') + b"\n" for record in records))
+        stat = os.stat(self.index_file)
+        self._offset, self._inode = stat.st_size, stat.st_ino
+
+    def _write_index(self, dim: int, entries):
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({"dim": dim}) + "\n")
+            for key, slot in entries:
+                f.write(json.dumps([key, slot]) + "\n")
+        os.replace(tmp_path, self.index_file)
+
+    def _compact(self):
+        # Une ligne par entrée, dans l'ordre LRU; les autres processus relisent le nouveau fichier
+        self._write_index(self.dim, self.entries.items())
+        stat = os.stat(self.index_file)
+        self._offset, self._inode, self._records = stat.st_size, stat.st_ino, len(self.entries)
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        with self._lock, file_lock(self.lock_file, shared=True):
+            self._refresh()
+            vectors = []
+            for key in keys:
+                slot = self.entries.get(key)
+                if slot is None or slot >= self.rows:
+                    vectors.append(None)
+                    continue
+                self.entries.move_to_end(key)
+                vectors.append(self._vectors[slot].tolist())
+            return vectors
+
+    def get(self, key: str) -> Optional[List[float]]:
+        return self.get_many([key])[0]
+
+    def put_many(self, items: List[tuple]):
+        """Enregistre une liste de (clé, vecteur) et ajoute leurs slots au journal"""
+        if not items:
+            return
+        with self._lock, file_lock(self.lock_file):
+            self._refresh()
+            records = []
+            if self.dim is None:
+                records.append({"dim": len(items[0][1])})
+                self._apply(records[0])
+            for key, vector in items:
+                if len(vector) != self.dim:
+                    continue
+                slot = self.entries.get(key)
+                if slot is None:
+                    if not self.free_slots and self.rows < self.capacity:
+                        self._grow()
+                    if self.free_slots:
+                        slot = self.free_slots.pop()
+                    else:
+                        # Cache plein: on réutilise le slot le moins récemment utilisé
+                        slot = next(iter(self.entries.values()))
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+                records.append([key, slot])
+                self._apply([key, slot])
+            self._vectors.flush()
+            self._append(records)
+            if self._records > self.COMPACT_FACTOR * max(len(self.entries), self.GROWTH_ROWS):
+                self._compact()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings avec cache disque persistant, clé = (modèle, sha256 du texte)"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str,
+                 cache_dir: str = EMBEDDING_CACHE_DIR, max_mb: int = EMBEDDING_CACHE_MAX_MB):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        # Un répertoire par modèle: les dimensions diffèrent d'un modèle à l'autre
+        directory = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', model_name))
+        self.store = EmbeddingStore(directory, max_bytes=max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str, kind: str = "doc") -> str:
+        # Requêtes et documents séparés: certains modèles les embarquent différemment
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors = self.store.get_many(keys)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            # Textes identiques dans le même lot: un seul appel
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            computed = dict(zip(unique, self.embeddings.embed_documents(unique)))
+            self.store.put_many([(self._key(text), vector) for text, vector in computed.items()])
+            for i in missing:
+                vectors[i] = computed[texts[i]]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text, kind="query")
+        vector = self.store.get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        self.store.put_many([(key, vector)])
+        return vector
@@ -0,0 +1,69 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set
+
+# Formes juridiques ignorées pour les alias ("Airbus SE" -> "airbus")
+LEGAL_SUFFIXES = {
+    "sa", "sas", "sasu", "sarl", "se", "sca", "inc", "ltd", "llc", "plc", "gmbh", "ag",
+    "corp", "corporation", "co", "company", "group", "groupe", "holding", "nv", "bv", "spa",
+}
+MIN_ALIAS_CHARS = 3
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces simples"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+class CompanyNameIndex:
+    """Index en mémoire des noms d'entreprises: correspondance exacte, normalisée et par alias"""
+
+    def __init__(self):
+        self.aliases: Dict[str, Set[str]] = {}
+        self.names: Dict[str, str] = {}
+        self.max_words = 1
+
+    @staticmethod
+    def _aliases_for(company_name: str) -> Set[str]:
+        normalized = normalize(company_name)
+        aliases = {normalized}
+        words = normalized.split()
+        while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+            words = words[:-1]
+        aliases.add(" ".join(words))
+        # Forme collée: "Total Energies" <-> "totalenergies"
+        aliases.add("".join(words))
+        return {a for a in aliases if a == normalized or len(a) >= MIN_ALIAS_CHARS}
+
+    def build(self, company_names: Iterable[str], extra_aliases: Optional[Dict[str, List[str]]] = None):
+        self.aliases, self.names, self.max_words = {}, {}, 1
+        extra_aliases = extra_aliases or {}
+        for company_name in company_names:
+            key = company_name.lower()
+            self.names[key] = company_name
+            aliases = self._aliases_for(company_name)
+            aliases.update(normalize(alias) for alias in extra_aliases.get(company_name, []))
+            for alias in aliases:
+                if not alias:
+                    continue
+                self.aliases.setdefault(alias, set()).add(key)
+                self.max_words = max(self.max_words, len(alias.split()))
+
+    def match(self, text: str) -> List[str]:
+        """Retourne les noms d'entreprises cités dans le texte, dans l'ordre d'apparition"""
+        words = normalize(text).split()
+        found: Dict[str, None] = {}
+        for start in range(len(words)):
+            for size in range(min(self.max_words, len(words) - start), 0, -1):
+                ngram = words[start:start + size]
+                keys = self.aliases.get(" ".join(ngram)) or self.aliases.get("".join(ngram))
+                if keys:
+                    for key in sorted(keys):
+                        found.setdefault(self.names[key])
+                    break
+        return list(found)
+
+    def __len__(self) -> int:
+        return len(self.names)
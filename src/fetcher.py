@@ -0,0 +1,236 @@
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from config import REQUEST_TIMEOUT, SCRAPE_TIERS_FILE, SCRAPE_TIER_TTL_DAYS, SCRAPE_CACHE_TTL, SCRAPE_TIMEOUT
+from src import metrics
+from src.browser import USER_AGENT
+from src.disk_cache import get_cache
+from src.file_lock import FileLock
+from src.scrape_policy import PageSession, policy_for
+
+# Même seuil et même priorité de sélecteurs que l'extraction Playwright
+MIN_CONTENT_CHARS = 200
+CONTENT_SELECTORS = ["main", "article", "#content", ".content", "#main", "body"]
+NON_TEXT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe"]
+# Éléments qui passent à la ligne dans le rendu du navigateur (inner_text); le texte des
+# autres éléments (a, em, strong, span...) reste dans la phrase qui les contient
+BLOCK_TAGS = [
+    "address", "article", "aside", "blockquote", "br", "caption", "dd", "details", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "legend", "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table", "tr", "ul",
+]
+# Cellules de tableau: séparées par un espace sur la ligne de leur rangée
+CELL_TAGS = ["td", "th"]
+_BLOCK_BREAK = "\x00"
+
+# Conteneurs vides typiques des applications rendues côté client
+SPA_ROOT_PATTERN = re.compile(
+    r'<div[^>]+id=["\'](root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>', re.IGNORECASE
+)
+NOSCRIPT_JS_PATTERN = re.compile(r"<noscript[^>]*>[^<]*(enable|activer|activez)[^<]*javascript", re.IGNORECASE)
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+_session.headers.update({
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
+})
+
+
+def fetch_html(url: str, validators: Optional[Dict] = None) -> Optional[requests.Response]:
+    """GET simple (connexions réutilisées), conditionnel si validators contient etag/last_modified
+
+    None si la réponse n'est ni du HTML exploitable ni un 304.
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    response = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+    if response.status_code == 304 and headers:
+        return response
+    if response.status_code != 200:
+        return None
+    if "html" not in response.headers.get("Content-Type", "").lower():
+        return None
+    return response
+
+
+def _block_text(element) -> str:
+    # Espaces du source réduits à un seul; une ligne par élément de bloc
+    lines = (" ".join(segment.split()) for segment in element.get_text().split(_BLOCK_BREAK))
+    return "\n".join(line for line in lines if line)
+
+
+def extract_text(html: str) -> str:
+    """Texte principal du HTML, avec la priorité de sélecteurs de scrape_url
+
+    Comme inner_text côté navigateur, les lignes ne sont coupées qu'aux
+    éléments de bloc: une phrase contenant un lien ou une emphase reste entière.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(NON_TEXT_TAGS):
+        tag.decompose()
+    for tag in soup(BLOCK_TAGS):
+        tag.insert_before(_BLOCK_BREAK)
+        tag.insert_after(_BLOCK_BREAK)
+    for tag in soup(CELL_TAGS):
+        tag.insert_after(" ")
+
+    content = ""
+    for selector in CONTENT_SELECTORS:
+        element = soup.select_one(selector)
+        if element:
+            content = _block_text(element)
+            if len(content) > MIN_CONTENT_CHARS:
+                break
+    return content
+
+
+def extract_page(page, url: str) -> str:
+    """Navigue vers l'URL et extrait le texte principal de la page (page Playwright du pool)"""
+    session = PageSession(page, url, policy_for(url))
+    with metrics.span("scrape_navigation", tier="browser") as span:
+        span.set(url=url)
+        page.goto(url, wait_until="domcontentloaded", timeout=SCRAPE_TIMEOUT)
+        session.wait_until_ready()
+
+    with metrics.span("scrape_extract", tier="browser"):
+        content = ""
+        for selector in CONTENT_SELECTORS:
+            try:
+                element = page.query_selector(selector)
+                if element:
+                    content = element.inner_text()
+                    if len(content) > MIN_CONTENT_CHARS:
+                        break
+            except:
+                continue
+
+        if not content:
+            content = page.inner_text("body")
+    return content
+
+
+def needs_javascript(html: str, text: str) -> bool:
+    """Détecte une page dont le contenu n'existe qu'après exécution du JavaScript"""
+    if len(text) <= MIN_CONTENT_CHARS:
+        return True
+    return bool(SPA_ROOT_PATTERN.search(html)) or bool(NOSCRIPT_JS_PATTERN.search(html))
+
+
+def cached_page(url: str, refresh: bool = False) -> Tuple[Optional[str], Optional[Dict]]:
+    """(texte en cache encore valide, entrée expirée à revalider)"""
+    if refresh or SCRAPE_CACHE_TTL <= 0:
+        return None, None
+    entry = get_cache().get("scrape", url, allow_stale=True)
+    if entry is None:
+        return None, None
+    if entry.fresh:
+        return entry.value["text"], None
+    return None, entry.value
+
+
+def store_page(url: str, text: str, tier: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+    if SCRAPE_CACHE_TTL <= 0 or not text:
+        return
+    get_cache().set("scrape", url, {
+        "text": text, "tier": tier, "etag": etag, "last_modified": last_modified
+    }, SCRAPE_CACHE_TTL)
+
+
+def scrape_http(url: str, stale: Optional[Dict] = None) -> Optional[str]:
+    """Chemin rapide sans navigateur; None si la page a besoin du rendu JavaScript
+
+    Avec une entrée expirée du cache, la requête est conditionnelle: un 304
+    prolonge l'entrée sans retélécharger ni réextraire la page.
+    """
+    try:
+        with metrics.span("scrape_navigation", tier="http") as span:
+            span.set(url=url)
+            response = fetch_html(url, stale)
+    except requests.RequestException as e:
+        print(f"Échec HTTP pour {url}: {e}")
+        return None
+    if response is None:
+        return None
+    if response.status_code == 304:
+        get_cache().touch("scrape", url, SCRAPE_CACHE_TTL)
+        return stale["text"]
+    html = response.text
+    with metrics.span("scrape_extract", tier="http"):
+        content = extract_text(html)
+        if needs_javascript(html, content):
+            return None
+    store_page(url, content, "http", response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return content
+
+
+class DomainTiers:
+    """Mémorise par domaine la méthode qui a fonctionné ('http' ou 'browser')"""
+
+    def __init__(self, path: str = SCRAPE_TIERS_FILE, ttl_days: float = SCRAPE_TIER_TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        # Fichier partagé par l'application, l'API et les lots
+        self._lock = FileLock(f"{path}.lock")
+        self.tiers: Dict[str, Dict] = self._read()
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _domain(url: str) -> str:
+        return (urlparse(url).hostname or "").lower()
+
+    def get(self, url: str) -> Optional[str]:
+        entry = self.tiers.get(self._domain(url))
+        # Au-delà du TTL on retente le chemin HTTP (le site a pu changer)
+        if not entry or time.time() - entry["at"] > self.ttl:
+            return None
+        return entry["tier"]
+
+    def record(self, url: str, tier: str):
+        """Mémorise la méthode du domaine; l'écriture du fichier est best-effort et ne fait jamais échouer le scraping"""
+        domain = self._domain(url)
+        entry = {"tier": tier, "at": time.time()}
+        previous = self.tiers.get(domain)
+        self.tiers[domain] = entry
+        if previous and previous["tier"] == tier and entry["at"] - previous["at"] < self.ttl / 2:
+            return
+        try:
+            with self._lock:
+                # Relu sous verrou: les domaines enregistrés par les autres processus sont conservés
+                tiers = {**self._read(), domain: entry}
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(tiers, f)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            self.tiers = tiers
+        except OSError as e:
+            print(f"Méthode de scraping non enregistrée pour {domain}: {e}")
+
+
+domain_tiers = DomainTiers()
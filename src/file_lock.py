@@ -0,0 +1,78 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path, shared: bool = False):
+    """Verrou fcntl entre processus sur le fichier path (créé au besoin)
+
+    Exclusif par défaut, partagé (plusieurs lecteurs) avec shared=True. Les
+    processus de l'application, de l'API et du worker partagent le répertoire
+    data/: c'est ce verrou, et non un verrou de thread, qui ordonne leurs
+    écritures. Chaque appel ouvre son propre descripteur, le verrou est donc
+    aussi exclusif entre threads du même processus.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FileLock:
+    """Verrou réentrant entre threads (RLock) et entre processus (fcntl sur path)
+
+    `with lock:` prend le verrou exclusif, `with lock.shared():` le verrou
+    partagé; seul le premier niveau d'imbrication d'un thread touche au
+    verrou fcntl, les niveaux suivants héritent de son mode (une écriture ne
+    doit donc pas être imbriquée dans une lecture partagée).
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def _acquire(self, shared: bool):
+        self._rlock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, 'a')
+                fcntl.flock(self._file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._rlock.release()
+
+    def __enter__(self):
+        self._acquire(shared=False)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._release()
+        return False
+
+    @contextmanager
+    def shared(self):
+        self._acquire(shared=True)
+        try:
+            yield self
+        finally:
+            self._release()
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    HTTP_POOL_SIZE, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX, HTTP_RETRY_AFTER_MAX,
+    HTTP_BREAKER_FAILURES, HTTP_BREAKER_RESET, REQUEST_TIMEOUT
+)
+
+# Réponses qui justifient un nouvel essai (quota, surcharge, erreur passagère)
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Le service distant est considéré indisponible: appel refusé sans requête réseau"""
+
+
+class CircuitBreaker:
+    """Disjoncteur: ouvert après `failure_threshold` échecs consécutifs
+
+    Une fois ouvert, les appels sont refusés pendant reset_timeout secondes,
+    puis un seul appel d'essai est autorisé (semi-ouvert): s'il réussit le
+    circuit se referme, sinon il se rouvre pour une nouvelle période.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = HTTP_BREAKER_FAILURES,
+                 reset_timeout: float = HTTP_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.trial_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            # Un essai resté sans issue (exception non réseau) ne bloque pas indéfiniment
+            trial_stale = time.monotonic() - self.trial_started >= self.reset_timeout
+            if state == "half_open" and (not self.trial_in_flight or trial_stale):
+                self.trial_in_flight = True
+                self.trial_started = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_in_flight:
+                    print(f"Circuit ouvert pour {self.name} ({self.failures} échecs consécutifs)")
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Délai demandé par l'en-tête Retry-After (secondes ou date HTTP)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """Session HTTP partagée pour un service distant: connexions réutilisées, nouveaux
+    essais avec backoff exponentiel et jitter, respect de Retry-After et disjoncteur"""
+
+    def __init__(self, name: str, pool_size: int = HTTP_POOL_SIZE, max_retries: int = HTTP_MAX_RETRIES,
+                 backoff_base: float = HTTP_BACKOFF_BASE, backoff_max: float = HTTP_BACKOFF_MAX,
+                 retry_after_max: float = HTTP_RETRY_AFTER_MAX, timeout: float = REQUEST_TIMEOUT,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(name)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": évite que des clients en échec réessaient tous au même instant
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method: str, url: str, max_retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """Comme requests.request; la dernière réponse 429/5xx est renvoyée si les essais sont épuisés"""
+        kwargs.setdefault("timeout", self.timeout)
+        retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Service {self.name} indisponible (circuit ouvert)")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure()
+                if attempt == retries:
+                    raise
+                delay = self._backoff(attempt)
+                reason = str(e)
+            else:
+                if response.status_code not in TRANSIENT_STATUS:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                retry_after = _retry_after(response)
+                # Un Retry-After trop long (quota journalier épuisé) ne vaut pas l'attente
+                if attempt == retries or (retry_after is not None and retry_after > self.retry_after_max):
+                    return response
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                reason = f"HTTP {response.status_code}"
+                response.close()
+            print(f"{self.name}: erreur transitoire ({reason}), nouvel essai dans {delay:.1f}s")
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+_clients: Dict[str, HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str, **kwargs) -> HttpClient:
+    """Client partagé par service distant ("google", "ollama"...), créé au premier usage"""
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = HttpClient(name, **kwargs)
+        return _clients[name]
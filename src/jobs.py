@@ -0,0 +1,341 @@
+"""File de tâches de fond: recherche d'entreprise, ajout au portefeuille, réindexation.
+
+Les traitements longs (recherche Google, génération du résumé, mise à jour de
+l'index) s'exécutent dans un pool de workers partagé par tout le processus au
+lieu du script Streamlit: l'interface soumet une tâche puis suit son état.
+Chaque tâche est persistée dans JOBS_DIR (un fichier JSON par tâche), ce qui
+permet de retrouver un résultat et de relancer les tâches interrompues après un
+redémarrage. Les tâches prioritaires passent devant, et une demande identique
+à une tâche encore en cours (même type, même entreprise) rejoint celle-ci.
+"""
+import atexit
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from config import JOBS_DIR, JOB_WORKERS, JOB_RETENTION
+from src.entities import normalize
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+# Une tâche interrompue (redémarrage) est relancée au plus ce nombre de fois
+MAX_ATTEMPTS = 3
+
+# Paramètres qui identifient une demande pour la déduplication
+DEDUP_FIELDS = {
+    "research": ("company_name",),
+    # Le commentaire en fait partie: deux ajouts de la même entreprise avec des commentaires
+    # différents sont deux demandes distinctes
+    "add_company": ("company_name", "comment"),
+    "reindex": (),
+}
+
+Handler = Callable[[Dict, Callable[..., None]], Any]
+
+
+class Job:
+    FIELDS = ("id", "kind", "params", "priority", "key", "status", "progress", "partial",
+              "result", "error", "attempts", "created_at", "started_at", "finished_at")
+
+    def __init__(self, kind: str, params: Dict, priority: int = PRIORITY_NORMAL, key: str = ""):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.priority = priority
+        self.key = key
+        self.status = QUEUED
+        self.progress = ""
+        # Résultat partiel consultable pendant l'exécution (ex: résumé en cours de génération)
+        self.partial: Any = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Job":
+        job = cls(data["kind"], data.get("params") or {})
+        for field in cls.FIELDS:
+            if field in data:
+                setattr(job, field, data[field])
+        return job
+
+
+def dedup_key(kind: str, params: Dict) -> str:
+    fields = DEDUP_FIELDS.get(kind)
+    if fields is None:
+        fields = sorted(params)
+    return kind + ":" + "|".join(normalize(str(params.get(field, ""))) for field in fields)
+
+
+class JobQueue:
+    """Pool de workers avec file à priorités et état persisté par tâche
+
+    submit() retourne immédiatement l'identifiant de la tâche (ou celui de la
+    tâche identique déjà en cours); get() et wait() permettent de suivre
+    l'avancement, le résultat partiel et le résultat final.
+    """
+
+    def __init__(self, handlers: Dict[str, Handler], jobs_dir: str = JOBS_DIR,
+                 workers: int = JOB_WORKERS, retention: float = JOB_RETENTION):
+        self.handlers = handlers
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.retention = retention
+        self.jobs: Dict[str, Job] = {}
+        self._inflight: Dict[str, str] = {}
+        self._heap: List = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._threads: List[threading.Thread] = []
+        self._load()
+
+    def _path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _save(self, job: Job):
+        # Écriture atomique: un arrêt brutal laisse l'ancienne version intacte
+        path = self._path(job.id)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _load(self):
+        """Recharge les tâches persistées; les tâches non terminées sont remises en file"""
+        cutoff = time.time() - self.retention
+        for path in sorted(self.jobs_dir.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = Job.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Tâche illisible ignorée ({path.name}): {e}")
+                continue
+            if job.finished:
+                if (job.finished_at or 0) < cutoff:
+                    path.unlink(missing_ok=True)
+                else:
+                    self.jobs[job.id] = job
+                continue
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = FAILED
+                job.error = "Tâche interrompue trop de fois"
+                job.finished_at = time.time()
+                self._save(job)
+                self.jobs[job.id] = job
+                continue
+            job.status = QUEUED
+            job.partial = None
+            self.jobs[job.id] = job
+            self._inflight[job.key] = job.id
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job.id))
+        for tmp in self.jobs_dir.glob("*.tmp"):
+            tmp.unlink(missing_ok=True)
+        if self._heap:
+            print(f"{len(self._heap)} tâche(s) reprise(s) après redémarrage")
+
+    def _prune(self):
+        """Oublie les tâches terminées depuis plus de retention secondes (appelé sous _cond)"""
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished and (job.finished_at or 0) < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+            self._path(job_id).unlink(missing_ok=True)
+
+    def start(self):
+        with self._cond:
+            if self._threads or self._stop:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind: str, params: Dict, priority: int = PRIORITY_NORMAL) -> str:
+        """Met une tâche en file; retourne l'identifiant d'une tâche identique encore en cours s'il y en a une"""
+        if kind not in self.handlers:
+            raise ValueError(f"Type de tâche inconnu: {kind}")
+        key = dedup_key(kind, params)
+        with self._cond:
+            existing = self._inflight.get(key)
+            if existing:
+                job = self.jobs[existing]
+                # Une demande plus urgente remonte la tâche en attente
+                if job.status == QUEUED and priority < job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job.id))
+                return existing
+            self._prune()
+            job = Job(kind, params, priority, key)
+            self.jobs[job.id] = job
+            self._inflight[key] = job.id
+            self._save(job)
+            heapq.heappush(self._heap, (priority, next(self._seq), job.id))
+            self._cond.notify_all()
+        self.start()
+        return job.id
+
+    def _next_job(self) -> Optional[Job]:
+        with self._cond:
+            while not self._stop:
+                while self._heap:
+                    priority, _, job_id = heapq.heappop(self._heap)
+                    job = self.jobs.get(job_id)
+                    # Entrée périmée (tâche déjà prise, ou remontée avec une autre priorité)
+                    if job is None or job.status != QUEUED or job.priority != priority:
+                        continue
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                    job.attempts += 1
+                    self._save(job)
+                    self._cond.notify_all()
+                    return job
+                self._cond.wait()
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                result = self.handlers[job.kind](job.params, lambda **kw: self._report(job, **kw))
+                self._finish(job, DONE, result=result)
+            except Exception as e:
+                print(f"Erreur de la tâche {job.kind} {job.id[:8]}: {e}")
+                self._finish(job, FAILED, error=str(e))
+
+    def _report(self, job: Job, progress: Optional[str] = None, partial: Any = None):
+        # Mis à jour en mémoire seulement: le résultat partiel n'est pas persisté
+        with self._cond:
+            if progress is not None:
+                job.progress = progress
+            if partial is not None:
+                job.partial = partial
+            self._cond.notify_all()
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None):
+        with self._cond:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            if self._inflight.get(job.key) == job.id:
+                del self._inflight[job.key]
+            self._save(job)
+            self._prune()
+            self._cond.notify_all()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Instantané de la tâche (état, avancement, résultat partiel ou final); None si inconnue"""
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = job.to_dict()
+            if job.status == QUEUED:
+                snapshot["position"] = sum(
+                    1 for other in self.jobs.values()
+                    if other.status == QUEUED and (other.priority, other.created_at) < (job.priority, job.created_at)
+                )
+            return snapshot
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Attend la fin de la tâche au plus timeout secondes; retourne son état courant"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._stop or job_id not in self.jobs or self.jobs[job_id].finished, timeout
+            )
+        return self.get(job_id)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def shutdown(self):
+        """Arrête les workers; les tâches en cours restent « running » et seront relancées au démarrage"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+
+def _research(params: Dict, report: Callable[..., None]) -> Dict:
+    from src.web_search import web_search, generate_resume_stream
+    company_name = params["company_name"]
+    report(progress="Recherche web")
+    urls, search_results = web_search(company_name)
+    report(progress="Génération du résumé")
+    resume = ""
+    for chunk in generate_resume_stream(company_name, search_results):
+        resume += chunk
+        report(partial=resume)
+    return {"company_name": company_name, "resume": resume}
+
+
+def _add_company(params: Dict, report: Callable[..., None]) -> Dict:
+    from src.manager import PortfolioManager
+    added = bool(PortfolioManager().add_company(
+        params["company_name"], params["resume"], params.get("comment", "")
+    ))
+    result = {"added": added, "reindex_job": None}
+    if added:
+        # Réindexation en tâche séparée, de faible priorité: plusieurs ajouts rapprochés n'en lancent qu'une
+        result["reindex_job"] = get_job_queue().submit("reindex", {}, PRIORITY_LOW)
+    return result
+
+
+def _reindex(params: Dict, report: Callable[..., None]) -> Dict:
+    # Import tardif: langchain/FAISS ne sont chargés que par le service RAG
+    from src.rag_service import get_rag_service
+    service = get_rag_service()
+    report(progress="Mise à jour de l'index")
+    service.refresh(force_rebuild=bool(params.get("force_rebuild")))
+    return service.health()
+
+
+HANDLERS: Dict[str, Handler] = {
+    "research": _research,
+    "add_company": _add_company,
+    "reindex": _reindex,
+}
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """File partagée par le processus, démarrée au premier usage (reprend les tâches interrompues)"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(HANDLERS)
+            _queue.start()
+            atexit.register(_queue.shutdown)
+        return _queue
@@ -1,105 +1,64 @@
-import csv
-import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from config import PORTFOLIO_FILE
+from config import PORTFOLIO_FILE, PORTFOLIO_BACKEND
+from src.storage import FIELDNAMES, create_storage, strip_comment_date
 
 
 class PortfolioManager:
     """Gestionnaire de portefeuille d'entreprises"""
 
-    def __init__(self, filename: str = PORTFOLIO_FILE):
+    def __init__(self, filename: str = PORTFOLIO_FILE, backend: str = PORTFOLIO_BACKEND):
         self.filename = filename
-        self.fieldnames = [
-            'company_name',
-            'resume',
-            'comments'
-        ]
-        self._initialize_csv()
-
-    def _initialize_csv(self):
-        # création du fichier
-        if not os.path.exists(self.filename):
-            with open(self.filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
-                writer.writeheader()
+        self.fieldnames = FIELDNAMES
+        self.storage = create_storage(backend, filename)
 
     def company_exists(self, company_name: str) -> bool:
-        companies = self.get_all_companies()
-        return any(c['company_name'].lower() == company_name.lower() for c in companies)
+        return self.storage.exists(company_name)
 
     def add_company(self, company_name: str, resume: str, initial_comment: str = ""):
-        if self.company_exists(company_name):
-            return False
-
-        with open(self.filename, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
-            writer.writerow({
-                'company_name': company_name,
-                'resume': resume,
-                'comments': initial_comment
-            })
-        return True
+        return self.storage.insert(company_name, resume, initial_comment, self._now())
+
+    def add_companies(self, companies: List[Dict]) -> int:
+        """Ajout en lot ({company_name, resume, comments}); retourne le nombre d'entreprises ajoutées"""
+        return self.storage.import_rows(companies)
 
     def add_comment(self, company_name: str, new_comment: str):
-        companies = self.get_all_companies()
-        found = False
+        return self.storage.append_comment(company_name, self._now(), new_comment)
 
-        for company in companies:
-            if company['company_name'].lower() == company_name.lower():
-                found = True
-                # Ajoute du nouveau commentaire
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                separator = " | " if company['comments'] else ""
-                company['comments'] = f"{company['comments']}{separator}[{timestamp}] {new_comment}"
-                break
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().strftime('%Y-%m-%d %H:%M')
 
-        if not found:
-            return False
+    def update_research(self, company_name: str, resume: Optional[str] = None) -> bool:
+        """Marque l'entreprise comme recherchée maintenant; remplace le résumé s'il est fourni"""
+        return self.storage.update_research(company_name, self._now(), resume)
 
-        self._write_all_companies(companies)
-        return True
+    def get_stale_companies(self, max_age_days: float, limit: Optional[int] = None) -> List[Dict]:
+        """Entreprises non recherchées depuis max_age_days, les plus anciennes (ou jamais) d'abord"""
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M')
+        stale = [c for c in self.get_all_companies() if (c.get('last_researched') or '') < cutoff]
+        stale.sort(key=lambda c: c.get('last_researched') or '')
+        return stale[:limit] if limit is not None else stale
 
     def get_last_comment(self, company_name: str) -> Optional[str]:
         """Retourne le dernier commentaire sans la date"""
-        company = self.get_company(company_name)
-        if not company or not company['comments']:
-            return None
-
-        # Sépare les commentaires par ' | '
-        comments_list = company['comments'].split(' | ')
-
-        if not comments_list:
+        last_comment = self.storage.get_last_comment(company_name)
+        if not last_comment:
             return None
+        return strip_comment_date(last_comment)
 
-        # Prend le dernier commentaire
-        last_comment = comments_list[-1]
+    def get_company(self, company_name: str) -> Optional[Dict]:
+        return self.storage.get(company_name)
 
-        # Enlève la date entre crochets [YYYY-MM-DD HH:MM]
-        if ']' in last_comment:
-            return last_comment.split('] ', 1)[-1]
+    def get_all_companies(self) -> List[Dict]:
+        return self.storage.get_all()
 
-        return last_comment
+    def last_modified(self) -> float:
+        """Date de dernière modification du stockage (0 si absent)"""
+        return self.storage.last_modified()
 
-    def get_company(self, company_name: str) -> Optional[Dict]:
-        companies = self.get_all_companies()
-        for company in companies:
-            if company['company_name'].lower() == company_name.lower():
-                return company
-        return None
+    def export_csv(self, csv_path: str):
+        self.storage.export_csv(csv_path)
 
-    def get_all_companies(self) -> List[Dict]:
-        companies = []
-        if not os.path.exists(self.filename):
-            return companies
-
-        with open(self.filename, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            companies = list(reader)
-        return companies
-
-    def _write_all_companies(self, companies: List[Dict]):
-        with open(self.filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
-            writer.writeheader()
-            writer.writerows(companies)
\ No newline at end of file
+    def import_csv(self, csv_path: str) -> int:
+        return self.storage.import_csv(csv_path)
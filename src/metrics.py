@@ -0,0 +1,232 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+from config import METRICS_ENABLED, METRICS_LOG_JSON
+
+PREFIX = "portfolio_"
+# Bornes (le) des histogrammes: durées en secondes, débits en tokens par seconde
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+_enabled = METRICS_ENABLED
+_log_json = METRICS_LOG_JSON
+# Les étapes ne sont mesurées que si la collecte ou le journal JSON est actif
+_active = _enabled or _log_json
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+
+def configure(enabled: Optional[bool] = None, log_json: Optional[bool] = None):
+    """Active ou désactive la collecte et le journal JSON (sinon METRICS_ENABLED / METRICS_LOG_JSON)"""
+    global _enabled, _log_json, _active
+    if enabled is not None:
+        _enabled = enabled
+    if log_json is not None:
+        _log_json = log_json
+    _active = _enabled or _log_json
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histogrammes et jauges par (nom, étiquettes), exportables au format texte Prometheus"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, labels: Dict, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                help_text: str = ""):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if name not in self.help and help_text:
+                self.help[name] = help_text
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def set_gauge(self, name: str, value: float, labels: Dict, help_text: str = ""):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self.gauges.setdefault(name, {})[key] = value
+            if name not in self.help and help_text:
+                self.help[name] = help_text
+
+    @staticmethod
+    def _labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = key + extra
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def export(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.histograms.items()):
+                full = PREFIX + name
+                if name in self.help:
+                    lines.append(f"# HELP {full} {self.help[name]}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{full}_bucket{self._labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{full}_bucket{self._labels(key, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{full}_sum{self._labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{full}_count{self._labels(key)} {histogram.count}")
+            for name, series in sorted(self.gauges.items()):
+                full = PREFIX + name
+                if name in self.help:
+                    lines.append(f"# HELP {full} {self.help[name]}")
+                lines.append(f"# TYPE {full} gauge")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{self._labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.gauges.clear()
+
+
+registry = Registry()
+
+
+class Span:
+    """Durée d'une étape, enregistrée dans l'histogramme stage_seconds{stage, ...}
+
+    Les étiquettes peuvent être complétées pendant l'étape (span.label(cache="hit"));
+    une exception est comptée avec status="error". Les attributs (span.set(...))
+    ne vont que dans le journal JSON, pour ne pas multiplier les séries.
+    """
+
+    __slots__ = ("stage", "labels", "attributes", "start")
+
+    def __init__(self, stage: str, labels: Dict):
+        self.stage = stage
+        self.labels = labels
+        self.attributes: Dict = {}
+        self.start = 0.0
+
+    def label(self, **labels):
+        self.labels.update(labels)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        labels = {"stage": self.stage, **self.labels, "status": "error" if exc_type else "ok"}
+        if _enabled:
+            registry.observe("stage_seconds", duration, labels, help_text="Durée des étapes (secondes)")
+        if _log_json:
+            print(json.dumps({
+                "ts": round(time.time(), 3), **labels, "duration_ms": round(duration * 1000, 2), **self.attributes
+            }, ensure_ascii=False, default=str))
+        return False
+
+
+class _NoopSpan:
+    """Étape non mesurée (métriques désactivées): une seule instance, aucune allocation"""
+
+    __slots__ = ()
+
+    def label(self, **labels):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str, **labels):
+    if not _active:
+        return _NOOP_SPAN
+    return Span(stage, labels)
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, help_text: str = "", **labels):
+    if _enabled:
+        registry.observe(name, value, labels, buckets, help_text)
+
+
+def set_gauge(name: str, value: float, help_text: str = "", **labels):
+    if _enabled:
+        registry.set_gauge(name, value, labels, help_text)
+
+
+def observe_generation(source: str, final: Dict, time_to_first_token: Optional[float] = None):
+    """Débit et latence d'une génération Ollama, d'après le dernier message (done=true)
+
+    Sans mesure côté client, le temps jusqu'au premier token est estimé par
+    chargement du modèle + prefill, tels que rapportés par Ollama.
+    """
+    if not _active:
+        return
+    if time_to_first_token is None and "prompt_eval_duration" in final:
+        time_to_first_token = (final.get("load_duration", 0) + final["prompt_eval_duration"]) / 1e9
+    tokens_per_second = None
+    if final.get("eval_count") and final.get("eval_duration"):
+        tokens_per_second = final["eval_count"] / (final["eval_duration"] / 1e9)
+    if _enabled:
+        if time_to_first_token is not None:
+            registry.observe("llm_time_to_first_token_seconds", time_to_first_token, {"source": source},
+                             help_text="Temps jusqu'au premier token (secondes)")
+        if tokens_per_second is not None:
+            registry.observe("llm_tokens_per_second", tokens_per_second, {"source": source},
+                             RATE_BUCKETS, "Débit de génération (tokens par seconde)")
+    if _log_json:
+        print(json.dumps({
+            "ts": round(time.time(), 3), "event": "llm_generation", "source": source,
+            "time_to_first_token_s": time_to_first_token, "tokens": final.get("eval_count"),
+            "tokens_per_second": tokens_per_second
+        }))
+
+
+def export_prometheus() -> str:
+    return registry.export()
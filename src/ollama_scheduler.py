@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional
+from config import OLLAMA_MAX_IN_FLIGHT, OLLAMA_MAX_INTERACTIVE, OLLAMA_MAX_RESEARCH, OLLAMA_MAX_BATCH
+from src import metrics
+
+# Classes de priorité, de la plus à la moins prioritaire
+INTERACTIVE = "interactive"
+RESEARCH = "research"
+BATCH = "batch"
+PRIORITY_CLASSES = (INTERACTIVE, RESEARCH, BATCH)
+
+# Temps d'attente récents conservés par classe pour les percentiles
+WAIT_SAMPLES = 1000
+
+_priority: ContextVar[Optional[str]] = ContextVar("ollama_priority", default=None)
+
+
+@contextmanager
+def ollama_priority(priority_class: str):
+    """Classe imposée aux appels Ollama du bloc (ex: BATCH pour un lot ou le rafraîchissement)"""
+    if priority_class not in PRIORITY_CLASSES:
+        raise ValueError(f"Classe de priorité inconnue: {priority_class}")
+    token = _priority.set(priority_class)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority(default: str = RESEARCH) -> str:
+    return _priority.get() or default
+
+
+class _Waiter:
+    __slots__ = ("priority_class", "enqueued_at", "granted", "notify")
+
+    def __init__(self, priority_class: str, notify):
+        self.priority_class = priority_class
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.notify = notify
+
+
+class _ClassStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.max_queued = 0
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+
+class OllamaScheduler:
+    """Ordonnanceur client de toutes les requêtes Ollama du processus
+
+    Au plus max_in_flight requêtes simultanées, et au plus class_limits[c] pour
+    chaque classe. Quand une place se libère, elle revient à la requête en
+    attente la plus prioritaire (interactive > research > batch) dont la classe
+    n'a pas atteint sa limite: un réindexage ne peut donc pas occuper toutes
+    les places et une question passe devant les requêtes en attente.
+    """
+
+    def __init__(self, max_in_flight: int = OLLAMA_MAX_IN_FLIGHT,
+                 class_limits: Optional[Dict[str, int]] = None):
+        self.max_in_flight = max(1, max_in_flight)
+        limits = class_limits or {
+            INTERACTIVE: OLLAMA_MAX_INTERACTIVE,
+            RESEARCH: OLLAMA_MAX_RESEARCH,
+            BATCH: OLLAMA_MAX_BATCH,
+        }
+        self.class_limits = {c: max(1, limits.get(c, self.max_in_flight)) for c in PRIORITY_CLASSES}
+        self.in_flight = 0
+        self._queues: Dict[str, Deque[_Waiter]] = {c: deque() for c in PRIORITY_CLASSES}
+        self._stats = {c: _ClassStats() for c in PRIORITY_CLASSES}
+        self._lock = threading.Lock()
+
+    def _dispatch(self):
+        # Appelé sous le verrou: attribue les places libres par ordre de priorité
+        while self.in_flight < self.max_in_flight:
+            for priority_class in PRIORITY_CLASSES:
+                queue = self._queues[priority_class]
+                if queue and self._stats[priority_class].in_flight < self.class_limits[priority_class]:
+                    self._grant(queue.popleft())
+                    break
+            else:
+                return
+
+    def _grant(self, waiter: _Waiter):
+        stats = self._stats[waiter.priority_class]
+        wait = time.monotonic() - waiter.enqueued_at
+        self.in_flight += 1
+        stats.in_flight += 1
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+        stats.waits.append(wait)
+        metrics.observe("ollama_queue_wait_seconds", wait, help_text="Attente d'une place Ollama (secondes)",
+                        priority=waiter.priority_class)
+        waiter.granted = True
+        waiter.notify()
+
+    def _enqueue(self, waiter: _Waiter):
+        with self._lock:
+            queue = self._queues[waiter.priority_class]
+            queue.append(waiter)
+            stats = self._stats[waiter.priority_class]
+            stats.max_queued = max(stats.max_queued, len(queue))
+            self._dispatch()
+
+    def release(self, priority_class: str):
+        with self._lock:
+            self.in_flight -= 1
+            self._stats[priority_class].in_flight -= 1
+            self._stats[priority_class].completed += 1
+            self._dispatch()
+
+    def _resolve(self, priority_class: Optional[str], default: str) -> str:
+        priority_class = priority_class or current_priority(default)
+        if priority_class not in PRIORITY_CLASSES:
+            raise ValueError(f"Classe de priorité inconnue: {priority_class}")
+        return priority_class
+
+    @contextmanager
+    def slot(self, priority_class: Optional[str] = None, default: str = RESEARCH):
+        """Place pour une requête (synchrone); la classe vient du contexte (ollama_priority) ou de default"""
+        priority_class = self._resolve(priority_class, default)
+        granted = threading.Event()
+        self._enqueue(_Waiter(priority_class, granted.set))
+        granted.wait()
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    @asynccontextmanager
+    async def slot_async(self, priority_class: Optional[str] = None, default: str = RESEARCH):
+        """Comme slot, sans bloquer la boucle asyncio pendant l'attente"""
+        priority_class = self._resolve(priority_class, default)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = _Waiter(priority_class, notify)
+        self._enqueue(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    self._queues[priority_class].remove(waiter)
+            # Place attribuée entre-temps: elle est rendue aussitôt
+            if waiter.granted:
+                self.release(priority_class)
+            raise
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    def stats(self) -> Dict:
+        """Par classe: requêtes en cours, en attente, terminées et temps d'attente (s)"""
+        with self._lock:
+            classes = {}
+            for priority_class, stats in self._stats.items():
+                waits = sorted(stats.waits)
+                granted = stats.completed + stats.in_flight
+                classes[priority_class] = {
+                    "limit": self.class_limits[priority_class],
+                    "in_flight": stats.in_flight,
+                    "queued": len(self._queues[priority_class]),
+                    "max_queued": stats.max_queued,
+                    "completed": stats.completed,
+                    "wait_avg": stats.wait_total / granted if granted else 0.0,
+                    "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                    "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                    "wait_max": stats.wait_max,
+                }
+            return {"max_in_flight": self.max_in_flight, "in_flight": self.in_flight, "classes": classes}
+
+
+_scheduler: Optional[OllamaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> OllamaScheduler:
+    """Ordonnanceur partagé par toutes les requêtes Ollama du processus"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OllamaScheduler()
+        return _scheduler
@@ -0,0 +1,130 @@
+import atexit
+import threading
+import time
+from typing import Dict, Optional
+from config import PORTFOLIO_FILE, VECTOR_STORE_PATH, RAG_REFRESH_INTERVAL
+from src.retrieval import PortfolioRAG
+
+
+class RAGService:
+    """PortfolioRAG unique partagé par toutes les sessions du processus
+
+    L'instance publiée n'est jamais modifiée: quand le portefeuille change, un
+    thread de fond construit une nouvelle instance (index rechargé depuis le
+    disque puis mis à jour de façon incrémentale) et la publie d'un seul coup.
+    Les requêtes en cours terminent sur l'ancienne instance; embeddings,
+    client LLM et cache de réponses sont partagés entre instances.
+    """
+
+    def __init__(self, csv_file: str = PORTFOLIO_FILE, vector_store_path: str = VECTOR_STORE_PATH,
+                 refresh_interval: float = RAG_REFRESH_INTERVAL):
+        self.csv_file = csv_file
+        self.vector_store_path = vector_store_path
+        self.refresh_interval = refresh_interval
+        self._current: Optional[PortfolioRAG] = None
+        self._indexed_mtime = 0.0
+        # Levé après la première tentative de chargement, réussie ou non
+        self._first_attempt = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._force_rebuild = False
+        self._build_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.swaps = 0
+        self.last_error: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name="rag-refresher", daemon=True)
+
+    def start(self):
+        with self._start_lock:
+            if not self._thread.is_alive() and not self._stop.is_set():
+                self._thread.start()
+
+    def _build(self, force_rebuild: bool = False) -> PortfolioRAG:
+        previous = self._current
+        if previous is None:
+            rag = PortfolioRAG(self.csv_file, self.vector_store_path)
+        else:
+            rag = PortfolioRAG(
+                self.csv_file, self.vector_store_path,
+                embeddings=previous.embeddings, llm=previous.llm, answer_cache=previous.answer_cache
+            )
+        # Relevé avant la construction: une écriture pendant celle-ci déclenchera un nouveau cycle
+        mtime = rag.portfolio.last_modified()
+        rag.build_vectorstore(force_rebuild=force_rebuild)
+        rag.setup_qa_chain()
+        self._indexed_mtime = mtime
+        return rag
+
+    def refresh(self, force_rebuild: bool = False):
+        """Construit une nouvelle instance et la publie (un seul constructeur à la fois)"""
+        with self._build_lock:
+            start = time.monotonic()
+            rag = self._build(force_rebuild)
+            self._current = rag
+            self.swaps += 1
+            self.last_error = None
+            print(f"Index RAG publié en {time.monotonic() - start:.1f}s (version {rag.index_version[:8]})")
+
+    def _changed(self) -> bool:
+        current = self._current
+        return current is None or current.portfolio.last_modified() != self._indexed_mtime
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            force_rebuild, self._force_rebuild = self._force_rebuild, False
+            if force_rebuild or self._changed():
+                try:
+                    self.refresh(force_rebuild)
+                except Exception as e:
+                    # L'instance précédente reste en service
+                    self.last_error = str(e)
+                    print(f"Erreur de mise à jour de l'index RAG: {e}")
+            self._first_attempt.set()
+            self._wake.wait(self.refresh_interval)
+
+    def request_refresh(self, force_rebuild: bool = False):
+        """Demande une vérification immédiate (après un ajout), sans attendre sa fin"""
+        if force_rebuild:
+            self._force_rebuild = True
+        self._wake.set()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[PortfolioRAG]:
+        """Instance courante; attend le premier chargement au plus timeout secondes (None si échec)"""
+        self.start()
+        self._first_attempt.wait(timeout)
+        return self._current
+
+    @property
+    def ready(self) -> bool:
+        return self._current is not None
+
+    def health(self) -> Dict:
+        current = self._current
+        return {
+            "ready": self.ready,
+            "index_version": current.index_version if current else None,
+            "companies": len(current.company_documents) if current else 0,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+            "answer_cache": current.answer_cache.stats() if current else None,
+        }
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+
+
+_service: Optional[RAGService] = None
+_service_lock = threading.Lock()
+
+
+def get_rag_service() -> RAGService:
+    """Service partagé, démarré au premier usage (chargement de l'index en arrière-plan)"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RAGService()
+            _service.start()
+            atexit.register(_service.shutdown)
+        return _service
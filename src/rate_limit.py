@@ -0,0 +1,64 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Seau à jetons: `rate` jetons par seconde, au plus `capacity` accumulés
+
+    acquire() bloque jusqu'à ce qu'un jeton soit disponible (ou jusqu'au
+    timeout), ce qui lisse les appels sous un quota par service distant.
+    """
+
+    def __init__(self, rate: float, capacity: float, name: str = ""):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.name = name
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_period(cls, count: float, period_seconds: float, burst: Optional[float] = None,
+                   name: str = "") -> "TokenBucket":
+        """Ex: TokenBucket.per_period(100, 86400) pour 100 appels par jour"""
+        return cls(count / period_seconds, burst if burst is not None else count, name)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Secondes à attendre avant que `tokens` jetons soient disponibles"""
+        with self._lock:
+            self._refill()
+            missing = tokens - self.tokens
+            return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None,
+                stop: Optional[threading.Event] = None) -> bool:
+        """Attend un jeton; False si timeout atteint ou si `stop` est déclenché"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.try_acquire(tokens):
+                return True
+            delay = self.wait_time(tokens)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or delay > remaining:
+                    return False
+                delay = min(delay, remaining)
+            if stop is not None:
+                if stop.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
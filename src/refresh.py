@@ -0,0 +1,157 @@
+"""Worker de rafraîchissement des résumés du portefeuille.
+
+À chaque cycle, les entreprises les moins récemment recherchées (au-delà de
+REFRESH_MAX_AGE_DAYS) sont recherchées à nouveau, sous un seau à jetons par
+service distant (quota Google Custom Search, charge Ollama). Le résumé n'est
+réécrit, et l'index vectoriel mis à jour, que si le nouveau résumé diffère
+réellement de l'ancien.
+
+Usage: python -m src.refresh [--once] [--max-age-days 30] [--batch-size 10]
+"""
+import argparse
+import difflib
+import signal
+import threading
+import time
+from typing import Dict, Optional
+from config import (
+    SCRAPE_NUM_URLS, REFRESH_MAX_AGE_DAYS, REFRESH_BATCH_SIZE, REFRESH_INTERVAL,
+    REFRESH_GOOGLE_PER_DAY, REFRESH_OLLAMA_PER_HOUR, REFRESH_SIMILARITY, REFRESH_FAILURE_BACKOFF
+)
+from src.entities import normalize
+from src.manager import PortfolioManager
+from src.ollama_scheduler import BATCH, ollama_priority
+from src.rate_limit import TokenBucket
+from src.web_search import (
+    web_search, scrape_top_results, generate_resume,
+    NO_RESULTS_MESSAGE, SEARCH_ERROR_PREFIX, SCRAPE_ERROR_PREFIX, RESUME_ERROR_PREFIXES
+)
+
+
+def materially_different(old_resume: str, new_resume: str, threshold: float = REFRESH_SIMILARITY) -> bool:
+    """Compare les résumés mot à mot (texte normalisé): simple reformulation ou vrai changement"""
+    old_words = normalize(old_resume).split()
+    if not old_words:
+        return True
+    ratio = difflib.SequenceMatcher(None, old_words, normalize(new_resume).split(), autojunk=False).ratio()
+    return ratio < threshold
+
+
+class RefreshScheduler:
+    def __init__(self, manager: Optional[PortfolioManager] = None,
+                 max_age_days: float = REFRESH_MAX_AGE_DAYS, batch_size: int = REFRESH_BATCH_SIZE,
+                 google_bucket: Optional[TokenBucket] = None, ollama_bucket: Optional[TokenBucket] = None,
+                 stop: Optional[threading.Event] = None):
+        self.manager = manager or PortfolioManager()
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self.google = google_bucket or TokenBucket.per_period(
+            REFRESH_GOOGLE_PER_DAY, 86400, burst=batch_size, name="google"
+        )
+        self.ollama = ollama_bucket or TokenBucket.per_period(
+            REFRESH_OLLAMA_PER_HOUR, 3600, burst=batch_size, name="ollama"
+        )
+        self.stop = stop or threading.Event()
+        self.retry_after: Dict[str, float] = {}
+        self._rag = None
+
+    def refresh_company(self, company: Dict) -> str:
+        """Recherche à nouveau une entreprise; retourne updated, unchanged, failed ou stopped"""
+        name = company['company_name']
+        if not self.google.acquire(stop=self.stop):
+            return "stopped"
+        urls, search_results = web_search(name, num_results=SCRAPE_NUM_URLS, refresh=True)
+        if not urls and search_results.startswith(SEARCH_ERROR_PREFIX):
+            print(f"{name}: {search_results}")
+            return "failed"
+        if not urls or search_results == NO_RESULTS_MESSAGE:
+            # Un résumé généré sans aucune source serait inventé: l'ancien est conservé
+            print(f"{name}: {NO_RESULTS_MESSAGE} Résumé conservé")
+            self.manager.update_research(name)
+            return "unchanged"
+
+        scraped_content = scrape_top_results(urls, refresh=True)
+        if scraped_content.startswith(SCRAPE_ERROR_PREFIX):
+            scraped_content = ""
+
+        if not self.ollama.acquire(stop=self.stop):
+            return "stopped"
+        with ollama_priority(BATCH):
+            resume = generate_resume(name, search_results, scraped_content)
+        if resume.startswith(RESUME_ERROR_PREFIXES):
+            print(f"{name}: {resume}")
+            return "failed"
+
+        if materially_different(company.get('resume') or '', resume):
+            self.manager.update_research(name, resume)
+            return "updated"
+        self.manager.update_research(name)
+        return "unchanged"
+
+    def _reindex(self):
+        # Import tardif: langchain/FAISS ne sont chargés qu'au premier résumé modifié
+        if self._rag is None:
+            from src.retrieval import PortfolioRAG
+            self._rag = PortfolioRAG()
+        self._rag.build_vectorstore()
+
+    def run_once(self) -> Dict:
+        """Un cycle: rafraîchit au plus batch_size entreprises, les plus anciennes d'abord"""
+        report = {"updated": 0, "unchanged": 0, "failed": 0, "stopped": 0}
+        now = time.time()
+        candidates = [
+            c for c in self.manager.get_stale_companies(self.max_age_days)
+            if self.retry_after.get(c['company_name'].lower(), 0) <= now
+        ][:self.batch_size]
+        if not candidates:
+            return report
+
+        print(f"Rafraîchissement de {len(candidates)} entreprise(s)")
+        for company in candidates:
+            if self.stop.is_set():
+                break
+            try:
+                status = self.refresh_company(company)
+            except Exception as e:
+                print(f"Erreur de rafraîchissement pour {company['company_name']}: {e}")
+                status = "failed"
+            report[status] += 1
+            if status == "failed":
+                self.retry_after[company['company_name'].lower()] = time.time() + REFRESH_FAILURE_BACKOFF
+            print(f"{company['company_name']}: {status}")
+
+        if report["updated"]:
+            self._reindex()
+        print(f"Cycle terminé: {report}")
+        return report
+
+    def run_forever(self, interval: float = REFRESH_INTERVAL):
+        while not self.stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Erreur du cycle de rafraîchissement: {e}")
+            self.stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="Un seul cycle puis arrêt")
+    parser.add_argument("--max-age-days", type=float, default=REFRESH_MAX_AGE_DAYS)
+    parser.add_argument("--batch-size", type=int, default=REFRESH_BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL, help="Secondes entre deux cycles")
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(max_age_days=args.max_age_days, batch_size=args.batch_size)
+    # Arrêt propre (docker stop, Ctrl+C): le cycle en cours s'interrompt entre deux appels
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: scheduler.stop.set())
+
+    if args.once:
+        scheduler.run_once()
+    else:
+        scheduler.run_forever(args.interval)
+
+
+if __name__ == "__main__":
+    main()
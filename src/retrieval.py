@@ -1,31 +1,161 @@
-import csv, json
+import hashlib
+import json
 import os
-from typing import List, Dict
-from langchain_ollama import OllamaEmbeddings
+import re
+import shutil
+from typing import Any, Iterator, List, Dict, Optional, Tuple
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_classic.schema import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_ollama import OllamaLLM
 from langchain_classic.chains import RetrievalQA
 from langchain_classic.prompts import PromptTemplate
-from config import VECTOR_STORE_PATH, OLLAMA_MODEL, OLLAMA_API, PORTFOLIO_FILE
+from config import (
+    VECTOR_STORE_PATH, OLLAMA_MODEL, OLLAMA_API, PORTFOLIO_FILE, RAG_TOP_K, RAG_FETCH_K,
+    RAG_SCORE_THRESHOLD, RAG_USE_MMR, RAG_MMR_LAMBDA, RAG_CONTEXT_TOKENS, COMPANY_ALIASES_FILE,
+    SEARCH_RRF_K, SEARCH_KEYWORD_MAX_TERMS, SEARCH_KEYWORD_MAX_DF
+)
+from src import metrics
+from src.answer_cache import AnswerCache
+from src.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from src.embeddings import BatchedOllamaEmbeddings, CachedEmbeddings
+from src.entities import CompanyNameIndex
+from src.file_lock import FileLock
+from src.manager import PortfolioManager
+from src.ollama_scheduler import INTERACTIVE, get_scheduler
+from src.storage import last_comment, strip_comment_date
+from src.tokens import count_tokens, truncate_to_tokens
+
+# Libellés du gabarit des documents (load_portfolio_data): présents partout, ils ne sont pas indexés par BM25
+TEMPLATE_LABELS = re.compile(
+    r"^\s*(?:Entreprise|Résumé|Commentaires|Dernier commentaire)\s*:|^\s*Aucun commentaire\s*$", re.MULTILINE
+)
+
+
+def keyword_text(doc: Document) -> str:
+    """Texte indexé par BM25: nom, résumé et commentaire, sans les libellés du gabarit"""
+    return TEMPLATE_LABELS.sub(" ", doc.page_content)
+
+
+class ScheduledOllamaLLM(OllamaLLM):
+    """OllamaLLM dont chaque génération (invoke ou stream) passe par l'ordonnanceur Ollama"""
+
+    def _create_generate_stream(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any):
+        # La place est gardée jusqu'à la fin du flux (ou l'abandon du générateur)
+        with get_scheduler().slot(default=INTERACTIVE), metrics.span("llm_generate", source="rag") as span:
+            first_token = None
+            for part in super()._create_generate_stream(prompt, stop, **kwargs):
+                first_token = self._observe(part, span, first_token)
+                yield part
+
+    async def _acreate_generate_stream(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any):
+        async with get_scheduler().slot_async(default=INTERACTIVE):
+            with metrics.span("llm_generate", source="rag") as span:
+                first_token = None
+                async for part in super()._acreate_generate_stream(prompt, stop, **kwargs):
+                    first_token = self._observe(part, span, first_token)
+                    yield part
+
+    @staticmethod
+    def _observe(part, span, first_token: Optional[float]) -> Optional[float]:
+        """Temps jusqu'au premier token, puis débit au dernier message du flux"""
+        if isinstance(part, str):
+            return first_token
+        if first_token is None and part.get("response"):
+            first_token = span.elapsed()
+        if part.get("done"):
+            metrics.observe_generation("rag", dict(part), first_token)
+        return first_token
+
+
+def pack_documents(documents: List[Document], max_tokens: int) -> List[Document]:
+    """Garde les documents dans l'ordre de pertinence tant qu'ils tiennent dans le budget de tokens"""
+    packed, used = [], 0
+    for doc in documents:
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= max_tokens:
+            packed.append(doc)
+            used += tokens
+        elif not packed:
+            # Le premier document dépasse à lui seul le budget: on le tronque
+            packed.append(Document(
+                page_content=truncate_to_tokens(doc.page_content, max_tokens),
+                metadata=doc.metadata
+            ))
+            used = max_tokens
+    return packed
+
+
+class BudgetedRetriever(BaseRetriever):
+    """Top-k borné (seuil de score, MMR optionnel) tenant dans un budget de tokens"""
+
+    vectorstore: Any
+    k: int = RAG_TOP_K
+    fetch_k: int = RAG_FETCH_K
+    score_threshold: float = RAG_SCORE_THRESHOLD
+    use_mmr: bool = RAG_USE_MMR
+    lambda_mult: float = RAG_MMR_LAMBDA
+    max_context_tokens: int = RAG_CONTEXT_TOKENS
+
+    def _scored_documents(self, query: str) -> List[Tuple[Document, float]]:
+        # Embedding de la question à part: la mesure faiss_search ne couvre que la recherche dans l'index
+        embedding = np.asarray(self.vectorstore.embeddings.embed_query(query), dtype=np.float32)
+        # Même normalisation que les vecteurs de l'index (normalize_L2)
+        embedding = (embedding / (np.linalg.norm(embedding) or 1.0)).tolist()
+        relevance = self.vectorstore._select_relevance_score_fn()
+        with metrics.span("faiss_search", mmr=self.use_mmr):
+            if self.use_mmr:
+                results = self.vectorstore.max_marginal_relevance_search_with_score_by_vector(
+                    embedding, k=self.k, fetch_k=self.fetch_k, lambda_mult=self.lambda_mult
+                )
+            else:
+                results = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=self.k)
+        scored = [(doc, relevance(distance)) for doc, distance in results]
+        # Sans seuil, aucun filtre: sur les distances L2 au carré, la pertinence peut être négative
+        if self.score_threshold <= 0:
+            return scored
+        return [(doc, score) for doc, score in scored if score >= self.score_threshold]
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        # Copies: les documents du docstore ne doivent pas porter le score de cette requête
+        documents = [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "score": float(score)})
+            for doc, score in self._scored_documents(query)
+        ]
+        return pack_documents(documents, self.max_context_tokens)
 
 
 class PortfolioRAG:
     # RAG pour chercher et naviguer dans les portfolios
-    def __init__(self, csv_file: str = PORTFOLIO_FILE, vector_store_path: str = VECTOR_STORE_PATH):
+    def __init__(self, csv_file: str = PORTFOLIO_FILE, vector_store_path: str = VECTOR_STORE_PATH,
+                 embeddings: Optional[CachedEmbeddings] = None, llm: Optional[OllamaLLM] = None,
+                 answer_cache: Optional[AnswerCache] = None):
         self.csv_file = csv_file
+        self.portfolio = PortfolioManager(csv_file)
         self.vector_store_path = vector_store_path
         self.metadata_file = os.path.join(vector_store_path, "index_metadata.json")
-        self.embeddings = OllamaEmbeddings(model=OLLAMA_MODEL, base_url=OLLAMA_API)
-        self.llm = OllamaLLM(model=OLLAMA_MODEL, base_url=OLLAMA_API, temperature=0.3)
+        # L'application, l'API et le worker de rafraîchissement partagent ce répertoire
+        self._lock = FileLock(f"{vector_store_path}.lock")
+        # Clients et cache injectables: partagés entre les instances successives du service RAG
+        self.embeddings = embeddings or CachedEmbeddings(
+            BatchedOllamaEmbeddings(model=OLLAMA_MODEL, base_url=OLLAMA_API),
+            model_name=OLLAMA_MODEL
+        )
+        self.llm = llm or ScheduledOllamaLLM(model=OLLAMA_MODEL, base_url=OLLAMA_API, temperature=0.3)
         self.vectorstore = None
         self.qa_chain = None
+        self.prompt = None
+        self.retriever = None
+        self.name_index = CompanyNameIndex()
+        self.bm25 = BM25Index()
+        self.index_version = ""
+        self.answer_cache = answer_cache or AnswerCache(embed=self.embeddings.embed_query)
+        self.company_documents: Dict[str, Document] = {}
 
     def _get_csv_modification_time(self) -> float:
-        """Get the last modification time of the CSV file."""
-        if os.path.exists(self.csv_file):
-            return os.path.getmtime(self.csv_file)
-        return 0
+        """Get the last modification time of the portfolio storage."""
+        return self.portfolio.last_modified()
 
     def _load_index_metadata(self) -> dict:
         """Load metadata about the last indexation."""
@@ -34,69 +164,104 @@ class PortfolioRAG:
                 return json.load(f)
         return {"last_csv_mtime": 0, "indexed_companies": []}
 
-    def _update_vectorstore_incrementally(self):
-        """Identify new documents and merge them with the existing index."""
-        metadata = self._load_index_metadata()
-        existing_company_names = set(metadata.get("indexed_companies", []))
-
-        # Also check from vectorstore if metadata is empty
-        if not existing_company_names and self.vectorstore:
-            for doc_id in self.vectorstore.docstore._dict:
-                doc = self.vectorstore.docstore.lookup(doc_id)
-                if doc and doc.metadata.get("company_name"):
-                    existing_company_names.add(doc.metadata["company_name"])
-
-        all_documents = self.load_portfolio_data()
-        new_documents = [
-            doc for doc in all_documents
-            if doc.metadata["company_name"] not in existing_company_names
-        ]
+    @staticmethod
+    def _content_hash(doc: Document) -> str:
+        """Empreinte du contenu indexé, utilisée aussi comme ID dans le docstore."""
+        return hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()
 
-        if not new_documents:
-            print("Aucune nouvelle donnée à indexer. Le vector store est à jour.")
-            return
+    def _indexed_hashes(self) -> Dict[str, str]:
+        """Return {content_hash: docstore_id} for the documents currently in the index.
 
-        print(f"Indexation de {len(new_documents)} nouveau(x) document(s)...")
-        new_faiss_index = FAISS.from_documents(new_documents, self.embeddings)
-        self.vectorstore.merge_from(new_faiss_index)
-        self.vectorstore.save_local(self.vector_store_path)
+        Lu dans le docstore chargé et non dans index_metadata.json: les métadonnées
+        peuvent avoir été réécrites par un autre processus depuis le chargement.
+        """
+        indexed = {}
+        for doc_id in self.vectorstore.index_to_docstore_id.values():
+            doc = self.vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                indexed[self._content_hash(doc)] = doc_id
+        return indexed
 
-        # Update metadata with all companies
-        all_company_names = [doc.metadata["company_name"] for doc in all_documents]
-        self._save_index_metadata(all_company_names)
-        print(f"Fusion réussie : {len(new_documents)} documents ajoutés.")
+    def _update_vectorstore_incrementally(self):
+        """Diff the portfolio against the index: re-embed only changed documents."""
+        with self._lock:
+            indexed = self._indexed_hashes()
+            current = {self._content_hash(doc): doc for doc in self.load_portfolio_data()}
+
+            stale_ids = [doc_id for h, doc_id in indexed.items() if h not in current]
+            new_hashes = [h for h in current if h not in indexed]
+
+            if stale_ids:
+                print(f"Suppression de {len(stale_ids)} document(s) obsolète(s)...")
+                self.vectorstore.delete(stale_ids)
+            if new_hashes:
+                print(f"Indexation de {len(new_hashes)} document(s) nouveau(x) ou modifié(s)...")
+                self.vectorstore.add_documents([current[h] for h in new_hashes], ids=new_hashes)
+            if not stale_ids and not new_hashes:
+                print("Aucune nouvelle donnée à indexer. Le vector store est à jour.")
+                self._save_index_metadata(list(current.values()))
+            else:
+                self._save_vectorstore(list(current.values()))
+        self._refresh_indexes()
+
+    def _save_vectorstore(self, documents: List[Document]):
+        """Écrit l'index et ses métadonnées à côté puis remplace le répertoire (sous self._lock)
+
+        Un processus qui charge l'index ne voit jamais un couple index.faiss /
+        index.pkl à moitié écrit, même après un arrêt brutal pendant l'écriture.
+        """
+        target = str(self.vector_store_path)
+        tmp, old = f"{target}.tmp", f"{target}.old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        self.vectorstore.save_local(tmp)
+        self._save_index_metadata(documents, os.path.join(tmp, os.path.basename(self.metadata_file)))
+        # os.replace ne remplace pas un répertoire non vide: l'ancien est d'abord mis de côté
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(target):
+            os.replace(target, old)
+        os.replace(tmp, target)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def _refresh_indexes(self):
+        """Rebuild the name and BM25 indexes from the documents currently in the vector store."""
+        self.company_documents = {}
+        for doc_id in self.vectorstore.index_to_docstore_id.values():
+            doc = self.vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                self.company_documents[doc.metadata["company_name"].lower()] = doc
+        aliases = {}
+        if os.path.exists(COMPANY_ALIASES_FILE):
+            with open(COMPANY_ALIASES_FILE, 'r', encoding='utf-8') as f:
+                aliases = json.load(f)
+        self.name_index.build(
+            (doc.metadata["company_name"] for doc in self.company_documents.values()), aliases
+        )
+        self.bm25.build(list(self.company_documents.values()), text=keyword_text)
+        # Version de l'index: change dès qu'un document est ajouté, modifié ou supprimé
+        self.index_version = hashlib.sha256(
+            "".join(sorted(self._content_hash(doc) for doc in self.company_documents.values())).encode()
+        ).hexdigest()
 
     def load_portfolio_data(self) -> List[Document]:
         documents = []
 
-        if not os.path.exists(self.csv_file):
-            print(f"Fichier {self.csv_file} non trouvé")
+        if not os.path.exists(self.portfolio.storage.path):
+            print(f"Fichier {self.portfolio.storage.path} non trouvé")
             return documents
 
-        with open(self.csv_file, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+        for row in self.portfolio.get_all_companies():
+            # Extraire le dernier commentaire sans date
+            comments_text = row['comments'] if row['comments'] else 'Aucun commentaire'
 
-            for row in reader:
-                # Extraire le dernier commentaire sans date
-                comments_text = row['comments'] if row['comments'] else 'Aucun commentaire'
+            # Si des commentaires existent, extraire le dernier sans date
+            if comments_text and comments_text != 'Aucun commentaire':
+                last_comment_clean = strip_comment_date(last_comment(comments_text))
+                comments_display = f"Dernier commentaire: {last_comment_clean}"
+            else:
+                comments_display = 'Aucun commentaire'
 
-                # Si des commentaires existent, extraire le dernier sans date
-                if comments_text and comments_text != 'Aucun commentaire':
-                    comments_list = comments_text.split(' | ')
-                    last_comment = comments_list[-1]
-
-                    # Enlever la date [YYYY-MM-DD HH:MM] si présente
-                    if ']' in last_comment:
-                        last_comment_clean = last_comment.split('] ', 1)[-1]
-                    else:
-                        last_comment_clean = last_comment
-
-                    comments_display = f"Dernier commentaire: {last_comment_clean}"
-                else:
-                    comments_display = 'Aucun commentaire'
-
-                # Créer un contenu structuré pour chaque entreprise
-                content = f"""
+            # Créer un contenu structuré pour chaque entreprise
+            content = f"""
     Entreprise: {row['company_name']}
 
     Résumé:
@@ -106,92 +271,118 @@ class PortfolioRAG:
     {comments_display}
     """
 
-                doc = Document(
-                    page_content=content,
-                    metadata={
-                        "company_name": row['company_name'],
-                        "source": "portfolio_csv"
-                    }
-                )
-                documents.append(doc)
+            doc = Document(
+                page_content=content,
+                metadata={
+                    "company_name": row['company_name'],
+                    "source": "portfolio_csv"
+                }
+            )
+            documents.append(doc)
 
         print(f"{len(documents)} entreprise(s) chargée(s)")
         return documents
 
-    def _save_index_metadata(self, indexed_companies: List[str]):
-        """Save metadata about the current indexation."""
-        os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
+    def _save_index_metadata(self, documents: List[Document], path: Optional[str] = None):
+        """Save metadata about the current indexation (one content hash per document)."""
+        path = path or self.metadata_file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        indexed = {}
+        for doc in documents:
+            content_hash = self._content_hash(doc)
+            indexed[content_hash] = {"id": content_hash, "company_name": doc.metadata["company_name"]}
         metadata = {
             "last_csv_mtime": self._get_csv_modification_time(),
-            "indexed_companies": indexed_companies
+            "normalize_L2": True,
+            "indexed_companies": [doc.metadata["company_name"] for doc in documents],
+            "documents": indexed
         }
-        with open(self.metadata_file, 'w') as f:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(metadata, f)
+        os.replace(tmp_path, path)
 
     def _needs_update(self) -> bool:
         """Check if the CSV file was modified since last indexation."""
         metadata = self._load_index_metadata()
         current_mtime = self._get_csv_modification_time()
-        return current_mtime > metadata["last_csv_mtime"]
+        return current_mtime != metadata["last_csv_mtime"]
 
     def build_vectorstore(self, force_rebuild: bool = False):
         """Build or load the FAISS vector store with automatic update detection."""
-        if not os.path.exists(self.csv_file):
-            print(f"Fichier source CSV {self.csv_file} non trouvé.")
+        if not os.path.exists(self.portfolio.storage.path):
+            print(f"Fichier source {self.portfolio.storage.path} non trouvé.")
             return
 
-        vectorstore_exists = os.path.exists(self.vector_store_path)
-
-        # Check if CSV was modified BEFORE loading vector store
-        needs_update = self._needs_update() if vectorstore_exists else False
-
-        # If CSV changed, force a complete rebuild
-        if needs_update:
-            print("Modifications détectées dans le CSV, reconstruction complète...")
-            force_rebuild = True
-
-        if vectorstore_exists and not force_rebuild:
-            print("Chargement du vector store existant...")
-            try:
-                self.vectorstore = FAISS.load_local(
-                    self.vector_store_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                print("Vector store chargé et à jour.")
-                return
-            except Exception as e:
-                print(f"Erreur lors du chargement : {e}. Reconstruction forcée...")
-                force_rebuild = True
+        with self._lock:
+            # Arrêt brutal entre les deux os.replace de _save_vectorstore: l'ancien index est restauré
+            old = f"{self.vector_store_path}.old"
+            if not os.path.exists(self.vector_store_path) and os.path.exists(old):
+                os.replace(old, self.vector_store_path)
+            vectorstore_exists = os.path.exists(self.vector_store_path)
+
+            if vectorstore_exists and not force_rebuild:
+                print("Chargement du vector store existant...")
+                try:
+                    self.vectorstore = FAISS.load_local(
+                        self.vector_store_path,
+                        self.embeddings,
+                        allow_dangerous_deserialization=True,
+                        normalize_L2=True
+                    )
+                except Exception as e:
+                    print(f"Erreur lors du chargement : {e}. Reconstruction forcée...")
+                    force_rebuild = True
+                else:
+                    # Index construit sans normalisation: les scores de pertinence n'y sont pas comparables
+                    if not self._load_index_metadata().get("normalize_L2"):
+                        print("Index au format précédent, reconstruction (embeddings servis par le cache)...")
+                        return self.build_vectorstore(force_rebuild=True)
+                    # Only the documents whose content changed are re-embedded
+                    if self._needs_update():
+                        print("Modifications détectées dans le portefeuille, mise à jour incrémentale...")
+                        self._update_vectorstore_incrementally()
+                    else:
+                        self._refresh_indexes()
+                    print("Vector store chargé et à jour.")
+                    return
 
-        # Full rebuild (either first time or after detecting changes)
-        if not vectorstore_exists or force_rebuild:
+            # Full rebuild (first time, forced, or unreadable index)
             print("Construction complète du vector store...")
             documents = self.load_portfolio_data()
             if not documents:
                 print("Aucune donnée à indexer")
                 return
 
-            self.vectorstore = FAISS.from_documents(documents, self.embeddings)
-            self.vectorstore.save_local(self.vector_store_path)
-
-            # Save metadata with current timestamp
-            company_names = [doc.metadata["company_name"] for doc in documents]
-            self._save_index_metadata(company_names)
-            print(f"Vector store créé avec {len(documents)} entreprise(s) dans {self.vector_store_path}")
+            # Un seul embed_documents (lots parallèles) puis un seul ajout groupé dans l'index
+            self.vectorstore = FAISS.from_documents(
+                documents, self.embeddings, ids=[self._content_hash(doc) for doc in documents], normalize_L2=True
+            )
+            # Save the index with its metadata (current timestamp and content hashes)
+            self._save_vectorstore(documents)
+        self._refresh_indexes()
+        print(f"Vector store créé avec {len(documents)} entreprise(s) dans {self.vector_store_path}")
+
+    def sync_index(self):
+        """Met à jour l'index avec les seuls documents modifiés (à appeler après mise à jour du CSV)"""
+        if self.vectorstore is None:
+            self.build_vectorstore()
+        else:
+            self._update_vectorstore_incrementally()
 
     def rebuild_index(self):
         """Force la reconstruction de l'index (à appeler après mise à jour du CSV)"""
         print("Reconstruction de l'index...")
         self.build_vectorstore(force_rebuild=True)
+        # La chaîne pointait vers l'ancien vector store
+        if self.qa_chain is not None:
+            self.setup_qa_chain()
 
     def setup_qa_chain(self):
         """Configure la chaîne de questions-réponses"""
         if self.vectorstore is None:
             print("Vector store non initialisé")
             return
-        num_docs = len(self.vectorstore.docstore._dict)
-        k_value = max(num_docs, 2)
         # Template de prompt personnalisé
         template = """Tu es un assistant spécialisé dans l'analyse de portefeuille d'entreprises.
 Utilise les informations suivantes pour répondre à la question de manière précise et professionnelle.
@@ -211,27 +402,61 @@ Réponse:"""
             template=template,
             input_variables=["context", "question"]
         )
+        self.prompt = PROMPT
+        self.retriever = BudgetedRetriever(vectorstore=self.vectorstore)
 
         self.qa_chain = RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(
-                search_kwargs={"k": k_value}  # nombre de documents à retourner
-            ),
+            retriever=self.retriever,
             chain_type_kwargs={"prompt": PROMPT},
             return_source_documents=True
         )
 
         print("Chaîne QA configurée")
 
-    def search(self, query: str, k: int = 3) -> List[Document]:
-        """Recherche par similarité dans le vector store"""
+    def search(self, query: str, k: int = 3, mode: str = "hybrid") -> List[Document]:
+        """Recherche hybride BM25 + similarité vectorielle (mode: hybrid, keyword ou vector)"""
         if self.vectorstore is None:
             print("Vector store non initialisé")
             return []
 
-        results = self.vectorstore.similarity_search(query, k=k)
-        return results
+        if mode == "vector":
+            return self._vector_search(query, k)
+
+        fetch_k = max(k, RAG_FETCH_K)
+        keyword_results = [doc for doc, _ in self.bm25.search(query, k=fetch_k)]
+        # Requête courte dont chaque mot départage les documents (ex: un nom): pas d'appel à Ollama
+        if mode == "keyword" or (
+            keyword_results and len(tokenize(query)) <= SEARCH_KEYWORD_MAX_TERMS
+            and self.bm25.is_discriminative(query, SEARCH_KEYWORD_MAX_DF)
+        ):
+            return keyword_results[:k]
+
+        vector_results = self._vector_search(query, fetch_k)
+        fused = reciprocal_rank_fusion([keyword_results, vector_results], key=self._content_hash, k=SEARCH_RRF_K)
+        return fused[:k]
+
+    def _vector_search(self, query: str, k: int) -> List[Document]:
+        embedding = self.embeddings.embed_query(query)
+        with metrics.span("faiss_search", mmr=False):
+            return self.vectorstore.similarity_search_by_vector(embedding, k=k)
+
+    def _build_prompt(self, question: str, documents: List[Document]) -> str:
+        with metrics.span("prompt_build", kind="rag"):
+            context = "\n\n".join(doc.page_content for doc in documents)
+            return self.prompt.format(context=context, question=question)
+
+    def route_question(self, question: str, companies: Optional[List[str]] = None) -> List[Document]:
+        """Documents des entreprises nommées dans la question (vide si aucune n'est reconnue)"""
+        if companies is None:
+            companies = self.name_index.match(question)
+        documents = [
+            self.company_documents[name.lower()]
+            for name in companies
+            if name.lower() in self.company_documents
+        ]
+        return pack_documents(documents, RAG_CONTEXT_TOKENS)
 
     def ask(self, question: str) -> Dict:
         """Pose une question sur le portefeuille"""
@@ -239,12 +464,52 @@ Réponse:"""
             print("Chaîne QA non initialisée")
             return {"answer": "Système non initialisé", "sources": []}
 
-        result = self.qa_chain.invoke({"query": question})
+        companies = self.name_index.match(question)
+        cached = self.answer_cache.get(question, self.index_version, companies)
+        if cached is not None:
+            return cached
+
+        # Chemin rapide: entreprise(s) citée(s) -> ni embedding de la question ni recherche vectorielle
+        documents = self.route_question(question, companies)
+        if documents:
+            answer = self.llm.invoke(self._build_prompt(question, documents))
+            response = {"answer": answer, "sources": documents}
+        else:
+            result = self.qa_chain.invoke({"query": question})
+            response = {
+                "answer": result["result"],
+                "sources": result["source_documents"]
+            }
+
+        self.answer_cache.put(question, self.index_version, response, companies)
+        return response
+
+    def ask_stream(self, question: str) -> Iterator[Dict]:
+        """Comme ask, en flux: d'abord {"sources": [...]}, puis des {"token": "..."}"""
+        if self.qa_chain is None:
+            print("Chaîne QA non initialisée")
+            yield {"sources": []}
+            yield {"token": "Système non initialisé"}
+            return
 
-        return {
-            "answer": result["result"],
-            "sources": result["source_documents"]
-        }
+        index_version = self.index_version
+        companies = self.name_index.match(question)
+        cached = self.answer_cache.get(question, index_version, companies)
+        if cached is not None:
+            yield {"sources": cached["sources"]}
+            yield {"token": cached["answer"]}
+            return
+
+        with metrics.span("retrieval"):
+            documents = self.route_question(question, companies) or self.retriever.invoke(question)
+        yield {"sources": documents}
+
+        tokens = []
+        for token in self.llm.stream(self._build_prompt(question, documents)):
+            tokens.append(token)
+            yield {"token": token}
+
+        self.answer_cache.put(question, index_version, {"answer": "".join(tokens), "sources": documents}, companies)
 
     def list_all_companies(self) -> List[str]:
         """Liste toutes les entreprises du portefeuille"""
@@ -253,7 +518,7 @@ Réponse:"""
 
     def find_companies_by_keyword(self, keyword: str) -> List[Document]:
         """Trouve les entreprises contenant un mot-clé"""
-        return self.search(keyword, k=5)
+        return self.search(keyword, k=5, mode="keyword")
 
 
 def initialize_rag(rebuild: bool = False) -> PortfolioRAG:
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from config import (
+    SCRAPE_BLOCKED_RESOURCES, SCRAPE_READY_MAX_MS, SCRAPE_READY_POLL_MS, SCRAPE_IDLE_MS,
+    SCRAPE_DOMAIN_OVERRIDES_FILE
+)
+
+# Attente fixe utilisée avant la détection adaptative (référence des métriques)
+LEGACY_WAIT_MS = 2000
+
+ANALYTICS_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "scorecardresearch.com", "criteo.com", "criteo.net", "taboola.com",
+    "outbrain.com", "newrelic.com", "nr-data.net", "clarity.ms", "matomo.cloud", "adsrvr.org",
+)
+
+# Longueur du texte principal, avec la même priorité de sélecteurs que l'extraction
+TEXT_LENGTH_JS = """() => {
+    for (const selector of ["main", "article", "#content", ".content", "#main", "body"]) {
+        const el = document.querySelector(selector);
+        if (el && el.innerText.length > 200) return el.innerText.length;
+    }
+    return document.body ? document.body.innerText.length : 0;
+}"""
+
+
+def host_of(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def _matches_domain(host: str, domain: str) -> bool:
+    return host == domain or host.endswith("." + domain)
+
+
+class ScrapePolicy:
+    """Réglages de chargement d'une page: ressources bloquées et attente maximale"""
+
+    def __init__(self, blocked_resources=SCRAPE_BLOCKED_RESOURCES, block_analytics: bool = True,
+                 max_wait_ms: int = SCRAPE_READY_MAX_MS, idle_ms: int = SCRAPE_IDLE_MS,
+                 fixed_wait_ms: Optional[int] = None):
+        self.blocked_resources = set(blocked_resources)
+        self.block_analytics = block_analytics
+        self.max_wait_ms = max_wait_ms
+        self.idle_ms = idle_ms
+        # Si défini, remplace la détection adaptative par une attente fixe (sites capricieux)
+        self.fixed_wait_ms = fixed_wait_ms
+
+
+def should_block(policy: ScrapePolicy, page_host: str, request) -> bool:
+    """Requête inutile pour l'extraction du texte (type de ressource bloqué ou traceur tiers)"""
+    if request.resource_type in policy.blocked_resources:
+        return True
+    if policy.block_analytics:
+        host = host_of(request.url)
+        if host != page_host and any(_matches_domain(host, d) for d in ANALYTICS_HOSTS):
+            return True
+    return False
+
+
+_overrides_cache: Dict = {"mtime": None, "overrides": {}}
+
+
+def _load_overrides() -> Dict[str, Dict]:
+    """Surcharges par domaine, ex: {"example.com": {"fixed_wait_ms": 2000, "blocked_resources": []}}"""
+    try:
+        mtime = os.path.getmtime(SCRAPE_DOMAIN_OVERRIDES_FILE)
+    except OSError:
+        return {}
+    if _overrides_cache["mtime"] != mtime:
+        with open(SCRAPE_DOMAIN_OVERRIDES_FILE, 'r', encoding='utf-8') as f:
+            _overrides_cache["overrides"] = {domain.lower(): o for domain, o in json.load(f).items()}
+        _overrides_cache["mtime"] = mtime
+    return _overrides_cache["overrides"]
+
+
+def policy_for(url: str) -> ScrapePolicy:
+    host = host_of(url)
+    for domain, override in _load_overrides().items():
+        if _matches_domain(host, domain):
+            return ScrapePolicy(**override)
+    return ScrapePolicy()
+
+
+class ScrapeMetrics:
+    """Compteurs cumulés: requêtes bloquées et temps gagné par rapport à l'attente fixe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.blocked_requests = 0
+        self.allowed_requests = 0
+        self.wait_ms = 0.0
+        self.saved_ms = 0.0
+        self.ready_by: Dict[str, int] = {}
+
+    def record_page(self, wait_ms: float, reason: str, blocked: int, allowed: int):
+        with self._lock:
+            self.pages += 1
+            self.blocked_requests += blocked
+            self.allowed_requests += allowed
+            self.wait_ms += wait_ms
+            self.saved_ms += LEGACY_WAIT_MS - wait_ms
+            self.ready_by[reason] = self.ready_by.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "pages": self.pages,
+                "blocked_requests": self.blocked_requests,
+                "allowed_requests": self.allowed_requests,
+                "avg_wait_ms": self.wait_ms / self.pages if self.pages else 0.0,
+                "saved_ms_total": self.saved_ms,
+                "ready_by": dict(self.ready_by),
+            }
+
+    def report(self):
+        """Journalise les compteurs cumulés (rien tant qu'aucune page n'est passée par le navigateur)"""
+        stats = self.snapshot()
+        if not stats["pages"]:
+            return
+        print(
+            f"Scraping navigateur: {stats['pages']} page(s), {stats['blocked_requests']} requête(s) bloquée(s), "
+            f"attente moyenne {stats['avg_wait_ms']:.0f} ms, {stats['saved_ms_total'] / 1000:.1f}s gagnées "
+            f"sur l'attente fixe de {LEGACY_WAIT_MS} ms ({stats['ready_by']})"
+        )
+
+
+scrape_metrics = ScrapeMetrics()
+
+
+class PageSession:
+    """Interception des requêtes et détection de page prête pour une page Playwright"""
+
+    def __init__(self, page, url: str, policy: ScrapePolicy):
+        self.page = page
+        self.policy = policy
+        self.page_host = host_of(url)
+        self.blocked = 0
+        self.allowed = 0
+        self.in_flight = 0
+        self.last_network_activity = time.monotonic()
+        page.route("**/*", self._route)
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_request_done)
+        page.on("requestfailed", self._on_request_done)
+
+    def _route(self, route):
+        if should_block(self.policy, self.page_host, route.request):
+            self.blocked += 1
+            route.abort()
+        else:
+            self.allowed += 1
+            route.continue_()
+
+    def _on_request(self, request):
+        self.in_flight += 1
+        self.last_network_activity = time.monotonic()
+
+    def _on_request_done(self, request):
+        self.in_flight = max(0, self.in_flight - 1)
+        self.last_network_activity = time.monotonic()
+
+    def wait_until_ready(self) -> str:
+        """Attend que la page soit exploitable; retourne la raison (idle, stable, fixed, timeout)"""
+        start = time.monotonic()
+        if self.policy.fixed_wait_ms is not None:
+            self.page.wait_for_timeout(self.policy.fixed_wait_ms)
+            reason = "fixed"
+        else:
+            reason = self._poll(start)
+        scrape_metrics.record_page((time.monotonic() - start) * 1000, reason, self.blocked, self.allowed)
+        return reason
+
+    def _poll(self, start: float) -> str:
+        deadline = start + self.policy.max_wait_ms / 1000
+        previous_length = -1
+        while time.monotonic() < deadline:
+            # Réseau calme depuis idle_ms: plus rien à attendre
+            idle_for = time.monotonic() - self.last_network_activity
+            if self.in_flight == 0 and idle_for * 1000 >= self.policy.idle_ms:
+                return "idle"
+            length = self.page.evaluate(TEXT_LENGTH_JS)
+            # Texte principal présent et inchangé entre deux relevés
+            if length > 200 and length == previous_length:
+                return "stable"
+            previous_length = length
+            self.page.wait_for_timeout(SCRAPE_READY_POLL_MS)
+        return "timeout"
@@ -0,0 +1,606 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+from config import COMMENT_LOG_COMPACT_BYTES
+from src import metrics
+from src.file_lock import FileLock
+
+FIELDNAMES = ['company_name', 'resume', 'comments', 'last_researched']
+COMMENT_SEPARATOR = " | "
+# Séparateur suivi d'une date: un texte de commentaire peut lui-même contenir " | "
+_DATED_SEPARATOR = re.compile(r" \| (?=\[\d{4}-\d{2}-\d{2}[^\]]*\] )")
+
+
+def split_comments(comments: str) -> List[Tuple[Optional[str], str]]:
+    """Découpe la colonne 'comments' en (date, texte); date vaut None si absente"""
+    entries = []
+    if not comments:
+        return entries
+    for entry in comments.split(COMMENT_SEPARATOR):
+        if entry.startswith('[') and '] ' in entry:
+            timestamp, text = entry[1:].split('] ', 1)
+            entries.append((timestamp, text))
+        else:
+            entries.append((None, entry))
+    return entries
+
+
+def join_comments(entries: List[Tuple[Optional[str], str]]) -> str:
+    """Inverse de split_comments: reconstruit la colonne 'comments'"""
+    return COMMENT_SEPARATOR.join(
+        f"[{timestamp}] {text}" if timestamp else text
+        for timestamp, text in entries
+    )
+
+
+def last_comment(comments: str) -> Optional[str]:
+    """Dernier commentaire (avec sa date) de la colonne 'comments', coupée aux seuls séparateurs datés"""
+    if not comments:
+        return None
+    return _DATED_SEPARATOR.split(comments)[-1]
+
+
+def strip_comment_date(comment: str) -> str:
+    """Enlève la date entre crochets [YYYY-MM-DD HH:MM]"""
+    if ']' in comment:
+        return comment.split('] ', 1)[-1]
+    return comment
+
+
+class PortfolioStorage:
+    """Interface commune des backends de stockage du portefeuille"""
+
+    path: str
+
+    def get_all(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def get(self, company_name: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def exists(self, company_name: str) -> bool:
+        return self.get(company_name) is not None
+
+    def insert(self, company_name: str, resume: str, initial_comment: str = "",
+               last_researched: str = "") -> bool:
+        raise NotImplementedError
+
+    def update_research(self, company_name: str, researched_at: str, resume: Optional[str] = None) -> bool:
+        """Enregistre la date de recherche et, si fourni, le nouveau résumé"""
+        raise NotImplementedError
+
+    def append_comment(self, company_name: str, timestamp: str, comment: str) -> bool:
+        raise NotImplementedError
+
+    def get_last_comment(self, company_name: str) -> Optional[str]:
+        """Retourne le dernier commentaire brut (avec sa date éventuelle)"""
+        company = self.get(company_name)
+        return last_comment(company['comments']) if company else None
+
+    def last_modified(self) -> float:
+        if os.path.exists(self.path):
+            return os.path.getmtime(self.path)
+        return 0
+
+    def import_csv(self, csv_path: str) -> int:
+        """Importe les entreprises d'un CSV; retourne le nombre de lignes ajoutées"""
+        if not os.path.exists(csv_path):
+            return 0
+        with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        return self.import_rows(rows)
+
+    def import_rows(self, rows: List[Dict]) -> int:
+        added = 0
+        for row in rows:
+            if self.insert(row['company_name'], row.get('resume') or '', row.get('comments') or '',
+                           row.get('last_researched') or ''):
+                added += 1
+        return added
+
+    def export_csv(self, csv_path: str):
+        """Exporte le portefeuille au format CSV historique"""
+        tmp_path = f"{csv_path}.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.get_all())
+        os.replace(tmp_path, csv_path)
+
+
+# Verrous partagés par chemin: plusieurs PortfolioManager (un par session Streamlit)
+# peuvent pointer vers le même fichier dans le même processus; le verrou fcntl
+# (fichier .lock) ordonne en plus les écritures de l'application, de l'API et du worker
+_FILE_LOCKS: Dict[str, FileLock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+
+def _lock_for(path: str) -> FileLock:
+    path = os.path.abspath(path)
+    with _FILE_LOCKS_GUARD:
+        if path not in _FILE_LOCKS:
+            _FILE_LOCKS[path] = FileLock(f"{path}.lock")
+        return _FILE_LOCKS[path]
+
+
+class _Snapshot:
+    """Vue parsée du CSV et de son journal, valide tant que la signature ne change pas"""
+
+    def __init__(self, signature: tuple, rows: List[Dict], last_comments: Dict[str, str]):
+        self.signature = signature
+        self.rows = rows
+        self.by_key = {row['company_name'].lower(): row for row in rows}
+        # Relevés sur le journal; la colonne du CSV ne sert qu'aux entreprises sans commentaire journalisé
+        self.last_comments = dict(last_comments)
+        for key, row in self.by_key.items():
+            if key not in self.last_comments and row['comments']:
+                self.last_comments[key] = last_comment(row['comments'])
+
+
+class CSVStorage(PortfolioStorage):
+    """Stockage dans un fichier CSV (comportement historique)
+
+    Les commentaires ajoutés après coup et les mises à jour de recherche
+    (date, nouveau résumé) vont dans un journal en ajout seul (une ligne JSON
+    par modification) fusionné à la lecture, puis compacté dans le CSV en
+    arrière-plan quand il dépasse compact_bytes. Toutes les écritures se font
+    sous verrou fcntl exclusif et les relectures sous verrou partagé: le
+    fichier est partagé par plusieurs processus.
+
+    Les lectures passent par un instantané en mémoire (lignes ordonnées et
+    dictionnaire par nom en minuscules), invalidé par nos propres écritures
+    ou quand la date/taille du CSV ou du journal change sur le disque.
+    """
+
+    def __init__(self, filename: str, compact_bytes: int = COMMENT_LOG_COMPACT_BYTES):
+        self.path = str(filename)
+        self.comments_log = f"{os.path.splitext(self.path)[0]}_comments.log"
+        # Journal en cours d'intégration, puis intégré au CSV temporaire (voir compact)
+        self._compacting_log = f"{self.comments_log}.compacting"
+        self._compacted_log = f"{self.comments_log}.compacted"
+        self.fieldnames = FIELDNAMES
+        self.compact_bytes = compact_bytes
+        self._lock = _lock_for(self.path)
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._snapshot: Optional[_Snapshot] = None
+        self._initialize_csv()
+
+    def _initialize_csv(self):
+        with self._lock:
+            self._recover_compaction()
+            # création du fichier
+            if not os.path.exists(self.path):
+                with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                    writer.writeheader()
+                return
+
+            # Migration: ancien en-tête sans les colonnes ajoutées depuis
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), [])
+            if header != self.fieldnames:
+                self._write_all_companies(self._read_csv())
+
+    def _read_csv(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f, restval=''))
+        for row in rows:
+            row.setdefault('last_researched', '')
+        return rows
+
+    def _read_log(self, path: Optional[str] = None) -> List[Dict]:
+        path = path or self.comments_log
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Ligne tronquée par un arrêt brutal pendant l'écriture
+                    continue
+        return records
+
+    @staticmethod
+    def _merge(companies: List[Dict], records: List[Dict],
+               last_comments: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """Rejoue les entrées du journal sur les lignes du CSV; relève le dernier commentaire par entreprise"""
+        by_key = {company['company_name'].lower(): company for company in companies}
+        for record in records:
+            company = by_key.get(record['key'])
+            if company is None:
+                continue
+            if record.get('type') == 'research':
+                company['last_researched'] = record['ts']
+                if record.get('resume') is not None:
+                    company['resume'] = record['resume']
+                continue
+            entry = f"[{record['ts']}] {record['comment']}"
+            separator = COMMENT_SEPARATOR if company['comments'] else ""
+            company['comments'] = f"{company['comments']}{separator}{entry}"
+            if last_comments is not None:
+                last_comments[record['key']] = entry
+        return companies
+
+    def _signature(self) -> tuple:
+        signature = []
+        for path in (self.path, self.comments_log):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load_snapshot(self) -> _Snapshot:
+        # Compaction interrompue par l'arrêt brutal d'un processus: terminée avant de relire
+        if os.path.exists(self._compacting_log) or os.path.exists(self._compacted_log):
+            with self._lock:
+                self._recover_compaction()
+        # Partagé: une compaction d'un autre processus ne peut pas intervenir entre les deux lectures
+        with self._lock.shared():
+            signature = self._signature()
+            if self._snapshot is None or self._snapshot.signature != signature:
+                last_comments: Dict[str, str] = {}
+                with metrics.span("csv_read") as span:
+                    rows = self._merge(self._read_csv(), self._read_log(), last_comments)
+                    span.set(rows=len(rows))
+                self._snapshot = _Snapshot(signature, rows, last_comments)
+            return self._snapshot
+
+    def get_all(self) -> List[Dict]:
+        # Copies: les appelants peuvent modifier les lignes sans corrompre l'instantané
+        return [dict(row) for row in self._load_snapshot().rows]
+
+    def get(self, company_name: str) -> Optional[Dict]:
+        company = self._load_snapshot().by_key.get(company_name.lower())
+        return dict(company) if company else None
+
+    def exists(self, company_name: str) -> bool:
+        return company_name.lower() in self._load_snapshot().by_key
+
+    def insert(self, company_name: str, resume: str, initial_comment: str = "",
+               last_researched: str = "") -> bool:
+        with self._lock:
+            if self.exists(company_name):
+                return False
+
+            with metrics.span("csv_write", op="insert"), open(self.path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                writer.writerow({
+                    'company_name': company_name,
+                    'resume': resume,
+                    'comments': initial_comment,
+                    'last_researched': last_researched
+                })
+            self._snapshot = None
+        return True
+
+    def update_research(self, company_name: str, researched_at: str, resume: Optional[str] = None) -> bool:
+        # Ajout au journal comme un commentaire: pas de réécriture du CSV à chaque rafraîchissement
+        record = {'type': 'research', 'ts': researched_at, 'key': company_name.lower()}
+        if resume is not None:
+            record['resume'] = resume
+        return self._append_record(company_name, record, op="research")
+
+    def import_rows(self, rows: List[Dict]) -> int:
+        # Un seul ajout en fin de fichier pour tout le lot
+        with self._lock:
+            known = set(self._load_snapshot().by_key)
+            new_rows = []
+            for row in rows:
+                key = row['company_name'].lower()
+                if key in known:
+                    continue
+                known.add(key)
+                new_rows.append({
+                    'company_name': row['company_name'],
+                    'resume': row.get('resume') or '',
+                    'comments': row.get('comments') or '',
+                    'last_researched': row.get('last_researched') or ''
+                })
+            if new_rows:
+                with metrics.span("csv_write", op="import"), open(self.path, 'a', newline='', encoding='utf-8') as f:
+                    csv.DictWriter(f, fieldnames=self.fieldnames).writerows(new_rows)
+                self._snapshot = None
+        return len(new_rows)
+
+    def append_comment(self, company_name: str, timestamp: str, comment: str) -> bool:
+        record = {'ts': timestamp, 'key': company_name.lower(), 'comment': comment}
+        return self._append_record(company_name, record, op="comment")
+
+    def _append_record(self, company_name: str, record: Dict, op: str) -> bool:
+        with self._lock:
+            if not self.exists(company_name):
+                return False
+            with metrics.span("csv_write", op=op), open(self.comments_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._snapshot = None
+        self._maybe_compact()
+        return True
+
+    def get_last_comment(self, company_name: str) -> Optional[str]:
+        return self._load_snapshot().last_comments.get(company_name.lower())
+
+    def last_modified(self) -> float:
+        mtimes = [
+            os.path.getmtime(path)
+            for path in (self.path, self.comments_log)
+            if os.path.exists(path)
+        ]
+        return max(mtimes) if mtimes else 0
+
+    def _maybe_compact(self):
+        try:
+            log_size = os.path.getsize(self.comments_log)
+        except OSError:
+            return
+        if log_size < self.compact_bytes:
+            return
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compaction_thread.start()
+
+    def compact(self):
+        """Intègre le journal (commentaires, recherches) dans le CSV puis le vide, sous verrou exclusif
+
+        Le journal est d'abord mis de côté (.compacting), fusionné dans un CSV
+        temporaire, marqué intégré (.compacted) et seulement alors le CSV est
+        remplacé: après un arrêt brutal à n'importe quelle étape,
+        _recover_compaction termine ou refait la compaction sans rejouer deux
+        fois une entrée.
+        """
+        with self._lock:
+            self._recover_compaction()
+            records = self._read_log()
+            if not records:
+                return
+            snapshot_valid = self._snapshot is not None and self._snapshot.signature == self._signature()
+            os.replace(self.comments_log, self._compacting_log)
+            self._compact_records(records)
+            # Le contenu logique est inchangé: l'instantané reste valable
+            if snapshot_valid:
+                self._snapshot.signature = self._signature()
+        print(f"Journal du portefeuille compacté ({len(records)} entrée(s))")
+
+    def _compact_records(self, records: List[Dict]):
+        tmp_path = self._write_csv_tmp(self._merge(self._read_csv(), records))
+        os.replace(self._compacting_log, self._compacted_log)
+        os.replace(tmp_path, self.path)
+        os.remove(self._compacted_log)
+
+    def _recover_compaction(self):
+        """Termine une compaction interrompue (appelé sous verrou exclusif)"""
+        if os.path.exists(self._compacted_log):
+            # Le CSV temporaire contient déjà le journal: il reste à le mettre en place
+            tmp_path = f"{self.path}.tmp"
+            if os.path.exists(tmp_path):
+                os.replace(tmp_path, self.path)
+            os.remove(self._compacted_log)
+        if os.path.exists(self._compacting_log):
+            # Journal pas encore intégré: la fusion est refaite depuis le début
+            print("Reprise d'une compaction du journal interrompue")
+            self._compact_records(self._read_log(self._compacting_log))
+            self._snapshot = None
+
+    def _write_csv_tmp(self, companies: List[Dict]) -> str:
+        tmp_path = f"{self.path}.tmp"
+        with metrics.span("csv_write", op="rewrite") as span:
+            span.set(rows=len(companies))
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                writer.writeheader()
+                writer.writerows(companies)
+                f.flush()
+                os.fsync(f.fileno())
+        return tmp_path
+
+    def _write_all_companies(self, companies: List[Dict]):
+        os.replace(self._write_csv_tmp(companies), self.path)
+
+
+class SQLiteStorage(PortfolioStorage):
+    """Stockage SQLite: index unique insensible à la casse et table de commentaires"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS companies (
+        id INTEGER PRIMARY KEY,
+        company_name TEXT NOT NULL,
+        name_key TEXT NOT NULL,
+        resume TEXT NOT NULL DEFAULT '',
+        last_researched TEXT NOT NULL DEFAULT ''
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_companies_name_key ON companies(name_key);
+    CREATE TABLE IF NOT EXISTS comments (
+        id INTEGER PRIMARY KEY,
+        company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+        created_at TEXT,
+        comment TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_comments_company ON comments(company_id, id);
+    """
+
+    def __init__(self, db_path: str, csv_seed: Optional[str] = None):
+        self.path = str(db_path)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+        # Migration: colonne ajoutée après la création des premières bases
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(companies)")}
+        if 'last_researched' not in columns:
+            conn.execute("ALTER TABLE companies ADD COLUMN last_researched TEXT NOT NULL DEFAULT ''")
+        conn.commit()
+
+        # Migration: première ouverture d'une base vide à côté d'un CSV existant
+        if csv_seed and self._count() == 0 and os.path.exists(csv_seed):
+            added = self.import_csv(csv_seed)
+            if added:
+                print(f"{added} entreprise(s) importée(s) depuis {csv_seed}")
+
+    @staticmethod
+    def _key(company_name: str) -> str:
+        return company_name.lower()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread (Streamlit exécute chaque session dans son thread)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+    def _rows_to_companies(self, rows) -> List[Dict]:
+        companies = []
+        for row in rows:
+            companies.append({
+                'company_name': row['company_name'],
+                'resume': row['resume'],
+                'comments': row['comments'] or '',
+                'last_researched': row['last_researched']
+            })
+        return companies
+
+    def _select(self, where: str = "", params: tuple = ()) -> List[Dict]:
+        rows = self._connection().execute(
+            f"""
+            SELECT c.company_name, c.resume, c.last_researched,
+                   (SELECT GROUP_CONCAT(entry, ?) FROM (
+                        SELECT CASE WHEN m.created_at IS NULL THEN m.comment
+                                    ELSE '[' || m.created_at || '] ' || m.comment END AS entry
+                        FROM comments m WHERE m.company_id = c.id ORDER BY m.id
+                   )) AS comments
+            FROM companies c {where}
+            ORDER BY c.id
+            """,
+            (COMMENT_SEPARATOR,) + params
+        ).fetchall()
+        return self._rows_to_companies(rows)
+
+    def get_all(self) -> List[Dict]:
+        return self._select()
+
+    def get(self, company_name: str) -> Optional[Dict]:
+        companies = self._select("WHERE c.name_key = ?", (self._key(company_name),))
+        return companies[0] if companies else None
+
+    def exists(self, company_name: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM companies WHERE name_key = ?", (self._key(company_name),)
+        ).fetchone()
+        return row is not None
+
+    def insert(self, company_name: str, resume: str, initial_comment: str = "",
+               last_researched: str = "") -> bool:
+        conn = self._connection()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO companies (company_name, name_key, resume, last_researched) VALUES (?, ?, ?, ?)",
+                    (company_name, self._key(company_name), resume, last_researched)
+                )
+                conn.executemany(
+                    "INSERT INTO comments (company_id, created_at, comment) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, timestamp, text) for timestamp, text in split_comments(initial_comment)]
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def append_comment(self, company_name: str, timestamp: str, comment: str) -> bool:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO comments (company_id, created_at, comment)
+                SELECT id, ?, ? FROM companies WHERE name_key = ?
+                """,
+                (timestamp, comment, self._key(company_name))
+            )
+        return cursor.rowcount > 0
+
+    def update_research(self, company_name: str, researched_at: str, resume: Optional[str] = None) -> bool:
+        conn = self._connection()
+        with conn:
+            if resume is None:
+                cursor = conn.execute(
+                    "UPDATE companies SET last_researched = ? WHERE name_key = ?",
+                    (researched_at, self._key(company_name))
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE companies SET last_researched = ?, resume = ? WHERE name_key = ?",
+                    (researched_at, resume, self._key(company_name))
+                )
+        return cursor.rowcount > 0
+
+    def get_last_comment(self, company_name: str) -> Optional[str]:
+        row = self._connection().execute(
+            """
+            SELECT m.created_at, m.comment FROM comments m
+            JOIN companies c ON c.id = m.company_id
+            WHERE c.name_key = ?
+            ORDER BY m.id DESC LIMIT 1
+            """,
+            (self._key(company_name),)
+        ).fetchone()
+        if row is None:
+            return None
+        return join_comments([(row['created_at'], row['comment'])])
+
+    def import_rows(self, rows: List[Dict]) -> int:
+        # Import en une seule transaction
+        conn = self._connection()
+        added = 0
+        with conn:
+            for row in rows:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO companies (company_name, name_key, resume, last_researched) "
+                    "VALUES (?, ?, ?, ?)",
+                    (row['company_name'], self._key(row['company_name']), row.get('resume') or '',
+                     row.get('last_researched') or '')
+                )
+                if cursor.rowcount == 0:
+                    continue
+                added += 1
+                conn.executemany(
+                    "INSERT INTO comments (company_id, created_at, comment) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, timestamp, text)
+                     for timestamp, text in split_comments(row.get('comments') or '')]
+                )
+        return added
+
+    def last_modified(self) -> float:
+        # En WAL, les écritures récentes touchent le fichier -wal avant le fichier principal
+        mtimes = [
+            os.path.getmtime(path)
+            for path in (self.path, f"{self.path}-wal")
+            if os.path.exists(path)
+        ]
+        return max(mtimes) if mtimes else 0
+
+
+def create_storage(backend: str, filename: str) -> PortfolioStorage:
+    """Instancie le backend de stockage configuré ('csv' ou 'sqlite')"""
+    backend = (backend or "csv").lower()
+    if backend == "csv":
+        return CSVStorage(filename)
+    if backend == "sqlite":
+        return SQLiteStorage(Path(filename).with_suffix(".db"), csv_seed=filename)
+    raise ValueError(f"Backend de stockage inconnu: {backend}")
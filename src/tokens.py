@@ -0,0 +1,37 @@
+import math
+from functools import lru_cache
+from config import TOKENIZER_ENCODING
+
+# Estimation utilisée si le tokenizer n'est pas disponible (pas de réseau au premier chargement)
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(f"Tokenizer {TOKENIZER_ENCODING} indisponible ({e}), estimation par caractères")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens du texte (BPE proche de celui de llama3)"""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Tronque le texte à max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -1,99 +1,136 @@
+import json
 import os
-from typing import List, Tuple
-import requests
+from typing import Iterator, List, Optional, Tuple
 import re
-from playwright.sync_api import sync_playwright
-from config import GOOGLE_API_URL, GOOGLE_API_KEY, GOOGLE_CX, OLLAMA_API_URL, SCRAPE_MAX_CHARS, SCRAPE_TIMEOUT, REQUEST_TIMEOUT
-
-
-def web_search(query: str, num_results: int = 1) -> Tuple[List[str], str]:
-    """Search using Google Custom Search API - returns both URLs and snippets"""
-    try:
-        response = requests.get(
-            GOOGLE_API_URL,
-            params={
-                "key": GOOGLE_API_KEY,
-                "cx": GOOGLE_CX,
-                "q": query,
-                "num": num_results
-            },
-            timeout=REQUEST_TIMEOUT
+from config import GOOGLE_API_URL, GOOGLE_API_KEY, GOOGLE_CX, OLLAMA_API_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT, SCRAPE_MAX_CHARS, SCRAPE_TIMEOUT, SCRAPE_READY_MAX_MS, SCRAPE_NUM_URLS, SEARCH_CACHE_TTL, REQUEST_TIMEOUT
+from src.async_scrape import scrape_urls
+from src.browser import get_browser_pool
+from src.context_builder import build_resume_context
+from src.http_client import get_client
+from src import metrics
+from src.ollama_scheduler import get_scheduler
+from src.fetcher import cached_page, domain_tiers, extract_page, scrape_http, store_page
+from src.disk_cache import get_cache
+from src.scrape_policy import scrape_metrics
+
+# Débuts des messages d'erreur renvoyés à la place d'un résultat
+SEARCH_ERROR_PREFIX = "Erreur de recherche"
+SCRAPE_ERROR_PREFIX = "Erreur de scraping"
+RESUME_ERROR_PREFIXES = ("Erreur lors de la génération du résumé", "Résumé non disponible")
+# Extraits renvoyés quand la recherche ne trouve rien: aucun contexte pour un résumé
+NO_RESULTS_MESSAGE = "Aucun résultat trouvé."
+
+
+def _search_cache_key(query: str, num_results: int) -> str:
+    return f"{num_results}:{' '.join(query.lower().split())}"
+
+
+def cached_search(query: str, num_results: int = 1) -> Optional[Tuple[List[str], str]]:
+    """Résultat de recherche encore valide dans le cache disque, sinon None"""
+    if SEARCH_CACHE_TTL <= 0:
+        return None
+    cached = get_cache().get("search", _search_cache_key(query, num_results))
+    if cached is None:
+        return None
+    return cached.value["urls"], cached.value["summary"]
+
+
+def search_params(query: str, num_results: int = 1) -> dict:
+    return {
+        "key": GOOGLE_API_KEY,
+        "cx": GOOGLE_CX,
+        "q": query,
+        "num": num_results
+    }
+
+
+def parse_search_response(query: str, num_results: int, data: dict) -> Tuple[List[str], str]:
+    """(URLs, extraits) d'une réponse Google Custom Search; les réponses valides sont mises en cache"""
+    if "error" in data:
+        error_msg = f"Erreur de recherche: {data['error'].get('message', 'Erreur inconnue')}"
+        return [], error_msg
+
+    results = []
+    urls = []
+    for item in data.get("items", []):
+        title = item.get("title", "")
+        snippet = item.get("snippet", "")
+        url = item.get("link", "")
+        results.append(f"{title}: {snippet}")
+        urls.append(url)
+
+    summary = "\n\n".join(results) if results else NO_RESULTS_MESSAGE
+    # Seules les réponses valides sont mises en cache, jamais les erreurs
+    if SEARCH_CACHE_TTL > 0:
+        get_cache().set(
+            "search", _search_cache_key(query, num_results), {"urls": urls, "summary": summary}, SEARCH_CACHE_TTL
         )
+    return urls, summary
+
+
+def web_search(query: str, num_results: int = 1, refresh: bool = False) -> Tuple[List[str], str]:
+    """Search using Google Custom Search API - returns both URLs and snippets (cached SEARCH_CACHE_TTL seconds)"""
+    with metrics.span("web_search", cache="hit") as span:
+        if not refresh:
+            cached = cached_search(query, num_results)
+            if cached is not None:
+                return cached
+
+        span.label(cache="miss")
+        try:
+            response = get_client("google").get(
+                GOOGLE_API_URL,
+                params=search_params(query, num_results),
+                timeout=REQUEST_TIMEOUT
+            )
+            return parse_search_response(query, num_results, response.json())
 
-        data = response.json()
-
-        if "error" in data:
-            error_msg = f"Erreur de recherche: {data['error'].get('message', 'Erreur inconnue')}"
-            return [], error_msg
-
-        results = []
-        urls = []
-        for item in data.get("items", []):
-            title = item.get("title", "")
-            snippet = item.get("snippet", "")
-            url = item.get("link", "")
-            results.append(f"{title}: {snippet}")
-            urls.append(url)
-
-        summary = "\n\n".join(results) if results else "Aucun résultat trouvé."
-        return urls, summary
-
-    except Exception as e:
-        return [], f"Erreur de recherche: {str(e)}"
+        except Exception as e:
+            span.label(cache="error")
+            return [], f"Erreur de recherche: {str(e)}"
 
 
-def scrape_url(url: str, max_chars: int = SCRAPE_MAX_CHARS) -> str:
-    """Scrape a URL using Playwright and return the text content"""
+def scrape_url(url: str, max_chars: int = SCRAPE_MAX_CHARS, refresh: bool = False) -> str:
+    """Scrape a URL (disk cache, plain HTTP, pooled Playwright browser if needed) and return the text content"""
     print(f"Scraping: {url}")
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT REQUEST_TIMEOUT.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        content, stale = cached_page(url, refresh)
+        if content is None and domain_tiers.get(url) != "browser":
+            content = scrape_http(url, stale)
+            if content is not None:
+                domain_tiers.record(url, "http")
+
+        if content is None:
+            # Navigation + attente maximale de chargement + marge pour la file d'attente du pool
+            content = get_browser_pool().run(
+                lambda page: extract_page(page, url),
+                timeout=(SCRAPE_TIMEOUT + SCRAPE_READY_MAX_MS) / 1000 * 2 + 5
             )
-            page = context.new_page()
-            page.goto(url, wait_until="domcontentloaded", timeout=SCRAPE_TIMEOUT)
-            page.wait_for_timeout(2000)
-
-            content = ""
-            selectors = ["main", "article", "#content", ".content", "#main", "body"]
-
-            for selector in selectors:
-                try:
-                    element = page.query_selector(selector)
-                    if element:
-                        content = element.inner_text()
-                        if len(content) > 200:
-                            break
-                except:
-                    continue
-
-            if not content:
-                content = page.inner_text("body")
+            domain_tiers.record(url, "browser")
+            store_page(url, content, "browser")
 
-            browser.close()
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
 
-            if len(content) > max_chars:
-                content = content[:max_chars] + "..."
-
-            return content.strip()
+        return content.strip()
 
     except Exception as e:
         return f"Erreur de scraping: {str(e)}"
 
 
+RESUME_PREFIX_PATTERNS = [
+    r"^Voici un résumé professionnel d[e'].*?:\s*",
+    r"^Voici le résumé.*?:\s*",
+    r"^Résumé professionnel.*?:\s*",
+    r"^\*\*.*?\*\*\s*",
+]
+
+
 def clean_resume(text: str) -> str:
     """Nettoie le résumé généré par le LLM"""
-    patterns_to_remove = [
-        r"^Voici un résumé professionnel d[e'].*?:\s*",
-        r"^Voici le résumé.*?:\s*",
-        r"^Résumé professionnel.*?:\s*",
-        r"^\*\*.*?\*\*\s*",
-    ]
-
     cleaned = text.strip()
-    for pattern in patterns_to_remove:
+    for pattern in RESUME_PREFIX_PATTERNS:
         cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE | re.MULTILINE)
 
     cleaned = re.sub(r'\*\*([^*]+)\*\*', r'\1', cleaned)
@@ -102,12 +139,103 @@ def clean_resume(text: str) -> str:
     return cleaned.strip()
 
 
-def generate_resume(company_name: str, search_results: str, scraped_content: str = "") -> str:
-    """Génère un résumé avec Ollama en utilisant les résultats de recherche ET le contenu scrapé"""
+class StreamingResumeCleaner:
+    """Version incrémentale de clean_resume pour un flux de tokens
 
-    context = f"Résultats de recherche:\n{search_results}"
-    if scraped_content:
-        context += f"\n\nContenu détaillé de la page web:\n{scraped_content}"
+    Le début de chaque ligne est retenu tant qu'il peut encore correspondre à
+    un préfixe à supprimer ("Voici le résumé...:", titre en gras); le reste
+    est émis immédiatement, sans les marqueurs ** ni les lignes vides en trop.
+    """
+
+    LINE_STARTS = ["voici un résumé professionnel d", "voici le résumé", "résumé professionnel", "**"]
+    MAX_PENDING_CHARS = 300
+
+    def __init__(self):
+        self.patterns = [re.compile(p, re.IGNORECASE) for p in RESUME_PREFIX_PATTERNS]
+        self.pending = ""
+        self.line_checked = False
+        self.started = False
+        self.newlines = 0
+        self.held = ""
+
+    def _may_be_prefix(self, text: str) -> bool:
+        lowered = text.lower()
+        return any(lowered.startswith(start) or start.startswith(lowered) for start in self.LINE_STARTS)
+
+    def _check_line_start(self, final: bool) -> bool:
+        """Retire les préfixes en début de ligne; False s'il faut attendre la suite"""
+        while not self.line_checked:
+            if not self.started:
+                self.pending = self.pending.lstrip()
+            if not self.pending:
+                return final
+            if not self._may_be_prefix(self.pending):
+                self.line_checked = True
+                break
+            match = next((m for m in (p.match(self.pending) for p in self.patterns) if m), None)
+            if match:
+                # Le \s* final peut encore s'étendre au prochain token
+                if not final and match.end() == len(self.pending):
+                    return False
+                self.pending = self.pending[match.end():]
+                continue
+            if final or "\n" in self.pending or len(self.pending) > self.MAX_PENDING_CHARS:
+                self.line_checked = True
+                break
+            return False
+        return True
+
+    def _emit(self, text: str) -> str:
+        output = []
+        for char in text:
+            if char == "\n":
+                self.newlines += 1
+                if self.newlines <= 2:
+                    self.held += char
+                continue
+            if char.isspace():
+                self.held += char
+                continue
+            self.newlines = 0
+            if self.started:
+                output.append(self.held)
+            self.held = ""
+            self.started = True
+            output.append(char)
+        return "".join(output)
+
+    def _process(self, final: bool) -> str:
+        output = []
+        while self.pending:
+            if not self._check_line_start(final):
+                break
+            line, newline, rest = self.pending.partition("\n")
+            if not newline and not final:
+                # Garde un éventuel "*" isolé: il peut former "**" avec le token suivant
+                emit_upto = len(line.rstrip("*"))
+                output.append(self._emit(line[:emit_upto].replace("**", "")))
+                self.pending = line[emit_upto:]
+                break
+            output.append(self._emit(line.replace("**", "") + newline))
+            self.pending = rest
+            self.line_checked = False
+        return "".join(output)
+
+    def feed(self, chunk: str) -> str:
+        self.pending += chunk
+        return self._process(final=False)
+
+    def flush(self) -> str:
+        return self._process(final=True)
+
+
+def _resume_messages(company_name: str, search_results: str, scraped_content: str = "") -> List[dict]:
+    # Contexte nettoyé et borné en tokens: durée de prefill prévisible
+    with metrics.span("prompt_build", kind="resume"):
+        search_context, page_context = build_resume_context(company_name, search_results, scraped_content)
+    context = f"Résultats de recherche:\n{search_context}"
+    if page_context:
+        context += f"\n\nContenu détaillé des pages web:\n{page_context}"
 
     messages = [
         {
@@ -125,46 +253,114 @@ IMPORTANT:
             "content": f"Entreprise: {company_name}\n\n{context}\n\nRésume cette entreprise de manière claire et professionnelle."
         }
     ]
+    return messages
 
-    try:
-        payload = {
-            "model": "llama3.2:3b",
-            "messages": messages,
-            "stream": False
-        }
 
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=60)
-        chunk = response.json()
+def resume_payload(company_name: str, search_results: str, scraped_content: str = "", stream: bool = False) -> dict:
+    return {
+        "model": OLLAMA_MODEL,
+        "messages": _resume_messages(company_name, search_results, scraped_content),
+        "stream": stream
+    }
+
+
+def parse_resume_response(chunk: dict) -> str:
+    if chunk.get("message", {}).get("content"):
+        raw_resume = chunk["message"]["content"]
+        return clean_resume(raw_resume)
+    else:
+        return "Résumé non disponible"
+
+
+def parse_resume_line(line, cleaner: StreamingResumeCleaner) -> Tuple[str, dict]:
+    """Une ligne NDJSON du flux Ollama: (texte nettoyé à émettre, message décodé)"""
+    chunk = json.loads(line)
+    if chunk.get("error"):
+        raise RuntimeError(chunk["error"])
+    return cleaner.feed(chunk.get("message", {}).get("content", "")), chunk
 
-        if chunk.get("message", {}).get("content"):
-            raw_resume = chunk["message"]["content"]
-            return clean_resume(raw_resume)
-        else:
-            return "Résumé non disponible"
+
+def generate_resume(company_name: str, search_results: str, scraped_content: str = "") -> str:
+    """Génère un résumé avec Ollama en utilisant les résultats de recherche ET le contenu scrapé"""
+    try:
+        payload = resume_payload(company_name, search_results, scraped_content)
+        with get_scheduler().slot(), metrics.span("llm_generate", source="resume"):
+            response = get_client("ollama").post(OLLAMA_API_URL, json=payload, timeout=OLLAMA_TIMEOUT)
+        chunk = response.json()
+        metrics.observe_generation("resume", chunk)
+        return parse_resume_response(chunk)
 
     except Exception as e:
         return f"Erreur lors de la génération du résumé: {str(e)}"
 
 
-def research_company(company_name: str, scrape_first: bool = True) -> Tuple[str, str, str]:
+def generate_resume_stream(company_name: str, search_results: str, scraped_content: str = "") -> Iterator[str]:
+    """Comme generate_resume, mais renvoie le résumé nettoyé au fil des tokens (flux NDJSON d'Ollama)"""
+    cleaner = StreamingResumeCleaner()
+    produced = False
+
+    try:
+        payload = resume_payload(company_name, search_results, scraped_content, stream=True)
+        # La place est gardée pendant toute la génération en flux
+        with get_scheduler().slot(), metrics.span("llm_generate", source="resume_stream") as span, \
+                get_client("ollama").post(OLLAMA_API_URL, json=payload, stream=True, timeout=OLLAMA_TIMEOUT) as response:
+            first_token = None
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                text, chunk = parse_resume_line(line, cleaner)
+                if first_token is None and chunk.get("message", {}).get("content"):
+                    first_token = span.elapsed()
+                if text:
+                    produced = True
+                    yield text
+                if chunk.get("done"):
+                    metrics.observe_generation("resume_stream", chunk, first_token)
+                    break
+        text = cleaner.flush()
+        if text:
+            produced = True
+            yield text
+        if not produced:
+            yield "Résumé non disponible"
+
+    except Exception as e:
+        yield f"Erreur lors de la génération du résumé: {str(e)}"
+
+
+def scrape_top_results(urls: List[str], refresh: bool = False) -> str:
+    """Contenu des meilleurs résultats: scraping concurrent s'il y a plusieurs URLs"""
+    if len(urls) > 1:
+        return scrape_urls(urls[:SCRAPE_NUM_URLS], refresh=refresh)
+    if urls:
+        return scrape_url(urls[0], refresh=refresh)
+    return ""
+
+
+def research_company(company_name: str, scrape_first: bool = True, refresh: bool = False) -> Tuple[str, str, str]:
     """
     Recherche complète d'une entreprise: search + scrape + résumé
+    refresh=True ignore le cache disque (recherche et pages)
     Returns: (search_results, scraped_content, resume)
     """
     print(f"Recherche: {company_name}")
 
-    # Step 1: Web search
-    urls, search_results = web_search(company_name)
-    print(f"Résultats de recherche: {search_results[:200]}...")
+    with metrics.span("research_company", scrape=scrape_first):
+        # Step 1: Web search
+        urls, search_results = web_search(company_name, num_results=SCRAPE_NUM_URLS if scrape_first else 1, refresh=refresh)
+        print(f"Résultats de recherche: {search_results[:200]}...")
+
+        # Step 2: Scrape the top URLs concurrently if enabled and available
+        scraped_content = ""
+        if scrape_first and urls:
+            scraped_content = scrape_top_results(urls, refresh)
+            print(f"Contenu scrapé: {scraped_content[:300]}...")
 
-    # Step 2: Scrape first URL if enabled and available
-    scraped_content = ""
-    if scrape_first and urls:
-        scraped_content = scrape_url(urls[0])
-        print(f"Contenu scrapé: {scraped_content[:300]}...")
+        # Step 3: Generate resume with all available info
+        resume = generate_resume(company_name, search_results, scraped_content)
+        print(f"Résumé: {resume}")
 
-    # Step 3: Generate resume with all available info
-    resume = generate_resume(company_name, search_results, scraped_content)
-    print(f"Résumé: {resume}")
+    if scrape_first:
+        scrape_metrics.report()
 
     return search_results, scraped_content, resume
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules sont importés comme dans l'application (`from src...`, `from config...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
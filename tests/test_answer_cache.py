@@ -0,0 +1,57 @@
+from src.answer_cache import AnswerCache
+
+RESULT = {"answer": "Réponse", "sources": []}
+
+
+def test_normalized_question_hit():
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.put("Que fait Acme ?", "v1", RESULT)
+    assert cache.get("que fait  ACME ?", "v1") == RESULT
+    assert cache.stats()["hits"] == 1
+
+
+def test_new_index_version_clears_cache():
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.put("Que fait Acme ?", "v1", RESULT)
+    assert cache.get("Que fait Acme ?", "v2") is None
+    # Le retour à l'ancienne version ne fait pas revenir les entrées
+    assert cache.get("Que fait Acme ?", "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entry_dropped():
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.put("Que fait Acme ?", "v1", RESULT)
+    next(iter(cache.entries.values())).created_at -= 61
+    assert cache.get("Que fait Acme ?", "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2, ttl=60)
+    cache.put("a", "v1", {"answer": "a"})
+    cache.put("b", "v1", {"answer": "b"})
+    assert cache.get("a", "v1") is not None
+    cache.put("c", "v1", {"answer": "c"})
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") is not None
+
+
+def test_routed_questions_never_embedded():
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return [1.0, 0.0]
+
+    cache = AnswerCache(embed=embed, max_entries=10, ttl=60, similarity_threshold=0.9)
+    cache.put("Que fait Acme ?", "v1", RESULT, companies=["Acme"])
+    assert cache.get("Que fait Globex ?", "v1", companies=["Globex"]) is None
+    assert calls == []
+
+
+def test_semantic_match_restricted_to_unrouted_questions():
+    cache = AnswerCache(embed=lambda text: [1.0, 0.0], max_entries=10, ttl=60, similarity_threshold=0.9)
+    cache.put("Quelles entreprises font du logiciel ?", "v1", RESULT)
+    assert cache.get("Quelles sociétés font du logiciel ?", "v1") == RESULT
+    assert cache.stats()["semantic_hits"] == 1
@@ -0,0 +1,34 @@
+from langchain_classic.schema import Document
+from src.bm25 import reciprocal_rank_fusion
+
+
+def _docs(*names):
+    return [Document(page_content=name, metadata={"company_name": name}) for name in names]
+
+
+def _names(documents):
+    return [doc.metadata["company_name"] for doc in documents]
+
+
+def _key(doc):
+    return doc.metadata["company_name"]
+
+
+def test_documents_in_both_rankings_come_first():
+    vector = _docs("a", "b", "c")
+    keyword = _docs("c", "d", "b")
+    assert _names(reciprocal_rank_fusion([vector, keyword], key=_key)) == ["c", "b", "a", "d"]
+
+
+def test_single_ranking_order_kept():
+    assert _names(reciprocal_rank_fusion([_docs("a", "b", "c")], key=_key)) == ["a", "b", "c"]
+
+
+def test_first_occurrence_returned():
+    first = _docs("a")
+    fused = reciprocal_rank_fusion([first, _docs("a")], key=_key)
+    assert len(fused) == 1 and fused[0] is first[0]
+
+
+def test_empty_rankings():
+    assert reciprocal_rank_fusion([[], []], key=_key) == []
@@ -0,0 +1,76 @@
+import threading
+import pytest
+from src.jobs import DONE, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, JobQueue, dedup_key
+
+
+@pytest.fixture
+def blocked_queue(tmp_path):
+    """File à un worker, bloqué sur la première tâche tant que release n'est pas levé"""
+    release = threading.Event()
+    started = threading.Event()
+    order = []
+
+    def handler(params, report):
+        if params.get("block"):
+            started.set()
+            release.wait(5)
+        order.append(params["company_name"])
+        return params["company_name"]
+
+    queue = JobQueue({"research": handler, "add_company": handler}, jobs_dir=str(tmp_path), workers=1)
+    queue.submit("research", {"company_name": "bloquante", "block": True})
+    assert started.wait(5)
+    yield queue, release, order
+    release.set()
+    queue.shutdown()
+
+
+def test_identical_request_joins_job(blocked_queue):
+    queue, release, _ = blocked_queue
+    first = queue.submit("research", {"company_name": "Acme"})
+    assert queue.submit("research", {"company_name": "ACME "}) == first
+    release.set()
+    assert queue.wait(first, timeout=5)["status"] == DONE
+    # Tâche terminée: une nouvelle demande crée une nouvelle tâche
+    assert queue.submit("research", {"company_name": "Acme"}) != first
+
+
+def test_add_company_dedup_includes_comment(blocked_queue):
+    queue, _, _ = blocked_queue
+    first = queue.submit("add_company", {"company_name": "Acme", "comment": "a"})
+    assert queue.submit("add_company", {"company_name": "Acme", "comment": "a"}) == first
+    assert queue.submit("add_company", {"company_name": "Acme", "comment": "b"}) != first
+    assert dedup_key("add_company", {"company_name": "Acme", "comment": "a"}) != \
+        dedup_key("add_company", {"company_name": "Acme", "comment": "b"})
+
+
+def test_priority_order(blocked_queue):
+    queue, release, order = blocked_queue
+    low = queue.submit("research", {"company_name": "basse"}, PRIORITY_LOW)
+    queue.submit("research", {"company_name": "normale"}, PRIORITY_NORMAL)
+    queue.submit("research", {"company_name": "haute"}, PRIORITY_HIGH)
+    assert queue.get(low)["position"] == 2
+    release.set()
+    queue.wait(low, timeout=5)
+    assert order == ["bloquante", "haute", "normale", "basse"]
+
+
+def test_urgent_request_promotes_queued_job(blocked_queue):
+    queue, release, order = blocked_queue
+    normal = queue.submit("research", {"company_name": "normale"}, PRIORITY_NORMAL)
+    low = queue.submit("research", {"company_name": "basse"}, PRIORITY_LOW)
+    assert queue.submit("research", {"company_name": "basse"}, PRIORITY_HIGH) == low
+    release.set()
+    queue.wait(normal, timeout=5)
+    assert order == ["bloquante", "basse", "normale"]
+
+
+def test_finished_jobs_pruned_after_retention(tmp_path):
+    queue = JobQueue({"research": lambda params, report: None}, jobs_dir=str(tmp_path), workers=1, retention=0)
+    first = queue.submit("research", {"company_name": "Acme"})
+    queue.wait(first, timeout=5)
+    second = queue.submit("research", {"company_name": "Globex"})
+    queue.wait(second, timeout=5)
+    queue.shutdown()
+    assert queue.get(first) is None
+    assert not (tmp_path / f"{first}.json").exists()
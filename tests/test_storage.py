@@ -0,0 +1,91 @@
+import os
+import pytest
+from src import storage
+from src.storage import CSVStorage, last_comment
+
+
+@pytest.fixture
+def csv_storage(tmp_path):
+    return CSVStorage(tmp_path / "portfolio.csv")
+
+
+def test_journal_merged_on_read(csv_storage):
+    csv_storage.insert("Acme", "Résumé initial", "[2024-01-01 10:00] premier")
+    csv_storage.append_comment("Acme", "2024-02-01 10:00", "second")
+    csv_storage.update_research("ACME", "2024-03-01 10:00", "Nouveau résumé")
+
+    # Une autre instance (autre session, autre processus) relit le CSV et le journal
+    company = CSVStorage(csv_storage.path).get("acme")
+    assert company["comments"] == "[2024-01-01 10:00] premier | [2024-02-01 10:00] second"
+    assert company["resume"] == "Nouveau résumé"
+    assert company["last_researched"] == "2024-03-01 10:00"
+
+
+def test_update_research_without_resume_keeps_resume(csv_storage):
+    csv_storage.insert("Acme", "Résumé")
+    csv_storage.update_research("Acme", "2024-03-01 10:00")
+    company = csv_storage.get("Acme")
+    assert company["resume"] == "Résumé"
+    assert company["last_researched"] == "2024-03-01 10:00"
+
+
+def test_unknown_company_not_logged(csv_storage):
+    assert not csv_storage.append_comment("Inconnue", "2024-01-01 10:00", "x")
+    assert not csv_storage.update_research("Inconnue", "2024-01-01 10:00")
+    assert not os.path.exists(csv_storage.comments_log)
+
+
+def test_last_comment_containing_separator(csv_storage):
+    csv_storage.insert("Acme", "Résumé", "[2024-01-01 10:00] ancien")
+    csv_storage.append_comment("Acme", "2024-02-01 10:00", "prix: 10 | 12 EUR")
+    assert csv_storage.get_last_comment("Acme") == "[2024-02-01 10:00] prix: 10 | 12 EUR"
+
+    csv_storage.compact()
+    assert CSVStorage(csv_storage.path).get_last_comment("Acme") == "[2024-02-01 10:00] prix: 10 | 12 EUR"
+
+
+def test_last_comment_from_csv_column():
+    assert last_comment("") is None
+    assert last_comment("[2024-01-01 10:00] a | b | [2024-02-01 10:00] c | d") == "[2024-02-01 10:00] c | d"
+    assert last_comment("sans date") == "sans date"
+
+
+def test_compact_empties_journal(csv_storage):
+    csv_storage.insert("Acme", "Résumé")
+    csv_storage.append_comment("Acme", "2024-02-01 10:00", "a")
+    csv_storage.append_comment("Acme", "2024-02-01 11:00", "b")
+    csv_storage.compact()
+
+    assert not os.path.exists(csv_storage.comments_log)
+    assert csv_storage._read_csv()[0]["comments"] == "[2024-02-01 10:00] a | [2024-02-01 11:00] b"
+
+
+@pytest.mark.parametrize("crash_before", ["compacted", "csv"])
+def test_interrupted_compaction_not_replayed(csv_storage, monkeypatch, crash_before):
+    csv_storage.insert("Acme", "Résumé")
+    csv_storage.append_comment("Acme", "2024-02-01 10:00", "a")
+    target = csv_storage._compacted_log if crash_before == "compacted" else csv_storage.path
+    replace = os.replace
+
+    def crash(src, dst):
+        if str(dst) == target:
+            raise KeyboardInterrupt
+        replace(src, dst)
+
+    monkeypatch.setattr(storage.os, "replace", crash)
+    with pytest.raises(KeyboardInterrupt):
+        csv_storage.compact()
+    monkeypatch.setattr(storage.os, "replace", replace)
+
+    # Redémarrage: la compaction est terminée, le commentaire n'apparaît qu'une fois
+    assert CSVStorage(csv_storage.path).get("Acme")["comments"] == "[2024-02-01 10:00] a"
+
+
+def test_import_rows_skips_existing(csv_storage):
+    csv_storage.insert("Acme", "Résumé")
+    added = csv_storage.import_rows([
+        {"company_name": "ACME", "resume": "doublon"},
+        {"company_name": "Globex", "resume": "Résumé Globex"},
+    ])
+    assert added == 1
+    assert [c["company_name"] for c in csv_storage.get_all()] == ["Acme", "Globex"]